@@ -65,3 +65,40 @@ function creat_rectangular_pie_chart(data) {
 	    }
 	});
 }
+
+function create_throughput_chart(data) {
+	// function to draw the created, submitted and completed lines
+	var series = [];
+	$.each(['created', 'submitted', 'completed'], function(i, name) {
+		series.push({
+			label: name.charAt(0).toUpperCase() + name.slice(1),
+			data: $.map(data[name], function(count, index) {
+				return [[index, count]];
+			})
+		});
+	});
+	var step = Math.max(1, Math.ceil(data.buckets.length / 12));
+	var ticks = [];
+	$.each(data.buckets, function(index, bucket) {
+		if (index % step == 0) {
+			ticks.push([index, bucket]);
+		}
+	});
+	$.plot('.throughput_chart', series, {
+	    series: {
+	        lines: {show: true},
+	        points: {show: true}
+	    },
+	    xaxis: {ticks: ticks},
+	    legend: {position: 'nw'}
+	});
+}
+
+function load_throughput(granularity) {
+	$.getJSON(urls.throughput_json_url, {granularity: granularity}, create_throughput_chart);
+}
+
+$('.throughput-granularity').click(function() {
+	load_throughput($(this).data('granularity'));
+});
+load_throughput('day');
@@ -113,6 +113,7 @@ TEMPLATE_CONTEXT_PROCESSORS = (
          "django.core.context_processors.static",
          "django.core.context_processors.tz",
          "django.core.context_processors.request",
+         "django.contrib.messages.context_processors.messages",
          "tasks.context_processors.task_count"
         )
 
@@ -1,3 +1,57 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import Task, WebhookDelivery, WebhookEndpoint
+
+
+class TaskAdmin(admin.ModelAdmin):
+    """
+    Admin for tasks. Saves and deletes go through the model signals, so the
+    status counters stay in sync with changes made here, and the event log
+    records who made them.
+    """
+    list_display = ('title', 'module', 'priority', 'type', 'status',
+                    'due_date', 'assigned_user')
+    list_filter = ('status', 'priority', 'type')
+    search_fields = ('title',)
+    list_select_related = True
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        obj.changed_by = request.user
+        obj.save()
+
+    def delete_model(self, request, obj):
+        obj.changed_by = request.user
+        obj.delete()
+
+
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ('url', 'is_active', 'rate_limit')
+
+
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    """
+    Admin for the webhook outbox, mostly to look into dead deliveries and
+    send them again once the endpoint is fixed.
+    """
+    list_display = ('id', 'endpoint', 'event_id', 'status', 'attempts',
+                    'next_attempt_at', 'last_error')
+    list_filter = ('status', 'endpoint')
+    list_select_related = True
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        count = queryset.exclude(
+            status=WebhookDelivery.STATUS_CHOICES.delivered).update(
+                status=WebhookDelivery.STATUS_CHOICES.pending,
+                attempts=0,
+                next_attempt_at=timezone.now())
+        self.message_user(request, "%d deliveries will be retried." % count)
+    retry.short_description = "Retry the selected deliveries"
+
+
+admin.site.register(Task, TaskAdmin)
+admin.site.register(WebhookEndpoint, WebhookEndpointAdmin)
+admin.site.register(WebhookDelivery, WebhookDeliveryAdmin)
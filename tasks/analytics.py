@@ -0,0 +1,102 @@
+"""
+Percentiles of how long tasks take from creation until they are submitted
+for review (lead time) and from there until they are completed (review
+wait).
+
+The durations are collected in a single pass over plain `values()` rows of
+the tasks and of the archive, read in keyset chunks, so no task objects are
+built whatever the window.
+"""
+import datetime
+import itertools
+from collections import OrderedDict, defaultdict
+
+from .export import iter_values
+from .models import Task, TaskArchive, local_today
+from .throughput import to_datetime
+
+
+PERCENTILES = (50, 90, 99)
+
+# Number of days looked back when no start date is given.
+DEFAULT_DAYS = 90
+
+# (slice, values() lookup) of every way the durations are broken down.
+SLICES = (
+    ('module', 'module'),
+    ('priority', 'priority'),
+    ('assignee', 'assigned_user__username'),
+)
+
+LOOKUPS = (tuple(lookup for name, lookup in SLICES) +
+           ('created', 'completed_at', 'reviewed_at'))
+
+
+def get_percentile(values, percentile):
+    """
+    Return the nearest-rank percentile of sorted values.
+    """
+    rank = -(-percentile * len(values) // 100)
+    return values[max(rank, 1) - 1]
+
+
+def summarize(durations):
+    """
+    Return the count and the percentiles of a list of durations in seconds.
+    """
+    durations = sorted(durations)
+    summary = OrderedDict([('count', len(durations))])
+    for percentile in PERCENTILES:
+        summary['p%d' % percentile] = (get_percentile(durations, percentile)
+                                       if durations else None)
+    return summary
+
+
+def get_slice_value(name, value):
+    if name == 'priority':
+        return Task.PRIORITY_CHOICES[value]
+    return value or ''
+
+
+def get_analytics(start=None, end=None):
+    """
+    Return the lead time and review wait percentiles, overall and per
+    module, priority and assignee, of the tasks submitted for review from
+    the start to the end date.
+    """
+    end = min(end or local_today(), local_today())
+    start = start or end - datetime.timedelta(days=DEFAULT_DAYS - 1)
+    filters = {
+        'completed_at__gte': to_datetime(start),
+        'completed_at__lt': to_datetime(end + datetime.timedelta(days=1)),
+    }
+    # Archived tasks are included.
+    rows = itertools.chain.from_iterable(
+        iter_values(model.objects.filter(**filters), LOOKUPS)
+        for model in (Task, TaskArchive))
+    durations = {
+        'lead_time': defaultdict(list),
+        'review_wait': defaultdict(list),
+    }
+    for row in rows:
+        keys = [('all', '')] + [(name, get_slice_value(name, row[lookup]))
+                                for name, lookup in SLICES]
+        lead_time = (row['completed_at'] - row['created']).total_seconds()
+        for key in keys:
+            durations['lead_time'][key].append(lead_time)
+        if row['reviewed_at'] is not None:
+            review_wait = (row['reviewed_at'] -
+                           row['completed_at']).total_seconds()
+            for key in keys:
+                durations['review_wait'][key].append(review_wait)
+    analytics = OrderedDict([('start', start), ('end', end)])
+    for measure in ('lead_time', 'review_wait'):
+        by_key = durations[measure]
+        analytics[measure] = OrderedDict(
+            [('all', summarize(by_key[('all', '')]))] +
+            [(name, OrderedDict(
+                (value, summarize(by_key[(name, value)]))
+                for value in sorted(value for key, value in by_key
+                                    if key == name)))
+             for name, lookup in SLICES])
+    return analytics
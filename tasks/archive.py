@@ -0,0 +1,112 @@
+"""
+Moving completed tasks that stopped changing into the archive table.
+
+Archived tasks keep counting in the task stats and the reports read
+through to the archive, so moving them does not announce any change: the
+rows are deleted from the task table with plain SQL, which sends no
+`post_delete` and leaves the stats and counters alone.
+
+Archived tasks keep their primary keys, which must not be handed out
+again. Databases without sequences (SQLite, MySQL before 8.0) number new
+rows after the highest id left in the table, so the newest task is never
+archived. Deleting it by hand afterwards can still free ids on those.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .facets import invalidate_facet_counts
+from .models import Task, TaskArchive
+from .versions import bump_version, get_version
+
+
+# Completed tasks untouched for this many days are archived.
+ARCHIVE_AFTER_DAYS = getattr(settings, 'TASK_ARCHIVE_AFTER_DAYS', 365)
+
+# Stays below the 999 parameters SQLite allows in the DELETE.
+ARCHIVE_BATCH_SIZE = 500
+
+VERSION_KEY = 'tasks:archive_version'
+
+# Fields copied from a task to its archived copy.
+ARCHIVED_FIELDS = tuple(field.name for field in Task._meta.fields)
+
+
+def get_archive_cutoff(days=ARCHIVE_AFTER_DAYS):
+    return timezone.now() - datetime.timedelta(days=days)
+
+
+def get_archivable(before):
+    """
+    The completed tasks that were last changed before the given time.
+    """
+    return Task.objects.filter(status=Task.STATUS_CHOICES.complete,
+                               last_modified__lt=before)
+
+
+def delete_tasks(pks):
+    qn = connection.ops.quote_name
+    cursor = connection.cursor()
+    cursor.execute('DELETE FROM %s WHERE %s IN (%s)' % (
+                       qn(Task._meta.db_table), qn(Task._meta.pk.column),
+                       ', '.join(['%s'] * len(pks))),
+                   pks)
+
+
+def archive_batch(before, batch_size):
+    """
+    Move up to `batch_size` archivable tasks in one transaction and return
+    how many were moved. The task with the highest id stays, it holds the
+    ids of the archived ones.
+    """
+    with transaction.atomic():
+        newest = Task.objects.aggregate(Max('pk'))['pk__max']
+        if newest is None:
+            return 0
+        rows = list(get_archivable(before).filter(pk__lt=newest)
+                                          .select_for_update()
+                                          .order_by('pk')
+                                          .values(*ARCHIVED_FIELDS)
+                                          [:batch_size])
+        if not rows:
+            return 0
+        TaskArchive.objects.bulk_create([
+            TaskArchive(**dict((Task._meta.get_field(name).attname, value)
+                               for name, value in row.items()))
+            for row in rows])
+        delete_tasks([row['id'] for row in rows])
+    return len(rows)
+
+
+def archive_tasks(before, batch_size=ARCHIVE_BATCH_SIZE, on_batch=None):
+    """
+    Move the completed tasks last changed before the given time to the
+    archive, a batch at a time. `on_batch` is called with the number moved
+    so far after every batch. Returns the total.
+    """
+    archived = 0
+    while True:
+        moved = archive_batch(before, batch_size)
+        if not moved:
+            break
+        archived += moved
+        if on_batch is not None:
+            on_batch(archived)
+    if archived:
+        bump_version(VERSION_KEY)
+        invalidate_facet_counts()
+    return archived
+
+
+def get_archive_version():
+    """
+    Return a version that changes whenever the archive does.
+    """
+    return get_version(VERSION_KEY)
+
+
+def invalidate_archive():
+    bump_version(VERSION_KEY)
@@ -0,0 +1,93 @@
+"""
+Where the pages that follow task changes learn about them.
+
+The default source reads the event log (see `tasks.events`), which every
+process appends to. The id of the latest event is kept in the cache, so a
+poll from a page that is up to date is answered without a query. Writers
+only ever move the cached id forward, but two of them racing can still
+leave an older one behind; the timeout bounds how long pages miss the
+newer change then. Deployments can point `TASK_CHANGE_SOURCE` at another
+source, and tests swap in a stand-in with `set_change_source`.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.module_loading import import_by_path
+
+from .models import TaskEvent
+
+
+CHANGE_SOURCE_CLASS = getattr(settings, 'TASK_CHANGE_SOURCE',
+                              'tasks.changes.EventLogChangeSource')
+
+LAST_EVENT_CACHE_KEY = 'tasks:last_event_id'
+LAST_EVENT_CACHE_TIMEOUT = 60
+
+# Most changes a poll lists, pages further behind are told to reload.
+CHANGES_LIMIT = 200
+
+
+class EventLogChangeSource(object):
+    """
+    Numbers the changes by the ids of their events.
+    """
+    def publish(self, last_id):
+        """
+        Announce that events up to `last_id` were appended.
+        """
+        current = cache.get(LAST_EVENT_CACHE_KEY)
+        if current is None or current < last_id:
+            cache.set(LAST_EVENT_CACHE_KEY, last_id, LAST_EVENT_CACHE_TIMEOUT)
+
+    def get_last_id(self):
+        last_id = cache.get(LAST_EVENT_CACHE_KEY)
+        if last_id is None:
+            last_id = TaskEvent.objects.aggregate(Max('pk'))['pk__max'] or 0
+            cache.add(LAST_EVENT_CACHE_KEY, last_id, LAST_EVENT_CACHE_TIMEOUT)
+        return last_id
+
+    def get_changes(self, since):
+        """
+        Return the id of the latest change and the primary keys of the
+        tasks changed after the change `since`, or None instead of them if
+        there are too many or `since` is not known. Without `since` they are
+        an empty list, as if nothing was missed.
+        """
+        # Only what is committed, the cached id may be ahead of it.
+        latest = TaskEvent.objects.aggregate(Max('pk'))['pk__max'] or 0
+        if since is None:
+            return latest, []
+        if since > latest:
+            return latest, None
+        task_pks = list(TaskEvent.objects.filter(pk__gt=since, pk__lte=latest)
+                                         .order_by('pk')
+                                         .values_list('task_id', flat=True)
+                                         [:CHANGES_LIMIT + 1])
+        if len(task_pks) > CHANGES_LIMIT:
+            return latest, None
+        return latest, sorted(set(pk for pk in task_pks if pk is not None))
+
+
+_source = None
+_source_lock = threading.Lock()
+
+
+def get_change_source():
+    global _source
+    with _source_lock:
+        if _source is None:
+            _source = import_by_path(CHANGE_SOURCE_CLASS)()
+        return _source
+
+
+def set_change_source(source):
+    """
+    Replace the change source, e.g. by a stand-in in tests, and return the
+    one it replaces.
+    """
+    global _source
+    with _source_lock:
+        previous, _source = _source, source
+    return previous
@@ -1,9 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+
+from .counters import get_status_count
 from .models import Task
 
 def task_count(request):
     """
     To make the count of unreviewed tasks available in menu navbar.
+
+    The count comes from the status counters in the cache and is only looked
+    up when a template actually shows it.
     """
-    unreviewed_tasks = Task.objects.filter(
-                            status=Task.STATUS_CHOICES.ready_for_review)
-    return {'unreviewed_task_count': unreviewed_tasks.count()}
+    unreviewed_task_count = SimpleLazyObject(
+        lambda: get_status_count(Task.STATUS_CHOICES.ready_for_review))
+    return {'unreviewed_task_count': unreviewed_task_count}
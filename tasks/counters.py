@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Sum
+
+from .models import Task, TaskStats
+from .versions import bump_version, get_version
+
+
+# The counters are moved by `apply_changes` and reread from the stats table
+# when they expire, one grouped query per timeout serving every reader. The
+# stats table is kept by the same signals, so writes that bypass them
+# (bulk_create, raw SQL) only show up after `rebuild_task_stats`, whatever
+# the timeout.
+COUNT_CACHE_TIMEOUT = getattr(settings, 'TASK_COUNT_CACHE_TIMEOUT', 60)
+
+
+STATS_VERSION_KEY = 'tasks:stats_version'
+
+
+def counters_enabled():
+    """
+    Whether the counters are kept. They are moved in the cache by the
+    process that changes a task, so every process has to share the cache:
+    with a per process cache, like the default local memory one, every
+    process would count on its own. The counts are read from the stats
+    table then. `TASK_SHARED_CACHE` overrides the guess.
+    """
+    shared = getattr(settings, 'TASK_SHARED_CACHE', None)
+    if shared is None:
+        shared = not isinstance(cache, (LocMemCache, DummyCache))
+    return shared
+
+
+def status_cache_key(status):
+    return 'tasks:status_count:%s' % status
+
+
+def count_tasks_by_status():
+    """
+    Return the number of tasks in every status from one grouped query over
+    the small stats table.
+    """
+    counts = dict((status, 0) for status, label in Task.STATUS_CHOICES)
+    counts.update(TaskStats.objects.values_list('status')
+                                   .annotate(Sum('count')))
+    return counts
+
+
+def get_status_counts():
+    """
+    Return the cached number of tasks in every status, recounting them all at
+    once if any counter is missing.
+
+    The counts are only cached if no status changed while they were read,
+    a change that missed the counters would be lost otherwise.
+    """
+    if not counters_enabled():
+        return count_tasks_by_status()
+    keys = dict((status_cache_key(status), status)
+                for status, label in Task.STATUS_CHOICES)
+    cached = cache.get_many(list(keys))
+    if len(cached) == len(keys):
+        return dict((keys[key], count) for key, count in cached.items())
+    version = get_stats_version()
+    counts = count_tasks_by_status()
+    if get_stats_version() == version:
+        cache.set_many(dict((status_cache_key(status), count)
+                            for status, count in counts.items()),
+                       COUNT_CACHE_TIMEOUT)
+    return counts
+
+
+def get_status_count(status):
+    """
+    Return the cached number of tasks in the given status.
+    """
+    count = None
+    if counters_enabled():
+        count = cache.get(status_cache_key(status))
+    if count is None:
+        count = get_status_counts()[status]
+    return count
+
+
+def apply_changes(changes):
+    """
+    Move the counters by the status changes in the given `TaskChange` list.
+    """
+    if any(change.has_changed('status') or change.has_changed('module')
+           for change in changes):
+        bump_version(STATS_VERSION_KEY)
+    if not counters_enabled():
+        return
+    deltas = defaultdict(int)
+    for change in changes:
+        if not change.has_changed('status'):
+            continue
+        if change.old is not None:
+            deltas[change.get_old('status')] -= 1
+        if change.new is not None:
+            deltas[change.get_new('status')] += 1
+    for status, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(status_cache_key(status), delta)
+        except ValueError:
+            # Not cached, the next read counts it from scratch.
+            pass
+
+
+def reset_status_counts():
+    """
+    Drop the counters, e.g. after tasks were written without signals.
+    """
+    cache.delete_many([status_cache_key(status)
+                       for status, label in Task.STATUS_CHOICES])
+    bump_version(STATS_VERSION_KEY)
+
+
+def get_stats_version():
+    """
+    Return a version that changes whenever the stats and counters do.
+    """
+    return get_version(STATS_VERSION_KEY)
@@ -0,0 +1,172 @@
+"""
+The append-only log of task changes and its consumers.
+
+Every `tasks_changed` signal is written as one `TaskEvent` row per change,
+with a single INSERT however many tasks changed. Consumers keep the id of
+the last event they processed in a `TaskEventCursor` and fold in only the
+events after it, so aggregates built from the log never rescan the task
+table.
+"""
+import datetime
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.forms.util import to_current_timezone
+from django.utils import timezone
+
+from .changes import get_change_source
+from .models import (Task, TaskEvent, TaskEventCursor, TaskTransitionCount,
+    local_today)
+
+
+EVENT_BATCH_SIZE = 1000
+
+# Events are only consumed once they are this old. Ids are handed out when
+# a row is inserted, not when it is committed, so on databases with
+# concurrent writers a slow transaction can commit an event behind ids a
+# consumer already moved past.
+EVENT_SETTLE_SECONDS = getattr(settings, 'TASK_EVENT_SETTLE_SECONDS', 1)
+
+TRANSITION_COUNTS_CONSUMER = 'transition_counts'
+
+# Number of days shown when no start date is given.
+DEFAULT_DAYS = 30
+
+
+def get_kind(change):
+    kinds = TaskEvent.KIND_CHOICES
+    if change.old is None:
+        return kinds.created
+    if change.new is None:
+        return kinds.deleted
+    if change.has_changed('status'):
+        return kinds.transitioned
+    if change.has_changed('assigned_user'):
+        return kinds.assigned
+    return kinds.edited
+
+
+def build_event(change, user=None, now=None):
+    """
+    Return the unsaved event of a `TaskChange`.
+    """
+    return TaskEvent(task_id=change.pk,
+                     kind=get_kind(change),
+                     user_id=getattr(user, 'pk', None),
+                     created=now or timezone.now(),
+                     old_status=change.get_old('status'),
+                     status=change.get_new('status'),
+                     old_module=change.get_old('module'),
+                     module=change.get_new('module'),
+                     old_assigned_user_id=change.get_old('assigned_user'),
+                     assigned_user_id=change.get_new('assigned_user'),
+                     due_date=change.get_new('due_date'))
+
+
+def record_changes(changes, user=None):
+    """
+    Append the events of a list of `TaskChange` with one INSERT, and tell
+    the pages that follow changes about them.
+    """
+    now = timezone.now()
+    TaskEvent.objects.bulk_create([build_event(change, user, now)
+                                   for change in changes])
+    get_change_source().publish(
+        TaskEvent.objects.aggregate(Max('pk'))['pk__max'])
+
+
+def consume(name, handler, batch_size=EVENT_BATCH_SIZE,
+            settle=EVENT_SETTLE_SECONDS, from_end=False, after_batch=None):
+    """
+    Call `handler` with the events the named consumer has not processed
+    yet, in id order and a batch at a time, and return how many there were.
+    A new consumer starts with the first event, or after the last one if
+    `from_end` is set.
+
+    Every batch is handled in the transaction that moves the cursor on, so
+    an event is never folded in twice, and the cursor row stays locked
+    meanwhile so that consumers of the same name run one at a time. Slow
+    work, like talking to other servers, belongs in `after_batch`, which is
+    called with what `handler` returned once that transaction committed.
+    """
+    processed = 0
+    until = timezone.now() - datetime.timedelta(seconds=settle)
+    defaults = {}
+    if from_end and not TaskEventCursor.objects.filter(name=name).exists():
+        defaults['last_event_id'] = (
+            TaskEvent.objects.aggregate(Max('pk'))['pk__max'] or 0)
+    while True:
+        with transaction.atomic():
+            cursor, created = (TaskEventCursor.objects.select_for_update()
+                                                      .get_or_create(
+                                                          name=name,
+                                                          defaults=defaults))
+            events = list(TaskEvent.objects
+                                   .filter(pk__gt=cursor.last_event_id,
+                                           created__lt=until)
+                                   .order_by('pk')[:batch_size])
+            if not events:
+                break
+            result = handler(events)
+            cursor.last_event_id = events[-1].pk
+            cursor.save(update_fields=['last_event_id'])
+        if after_batch is not None:
+            after_batch(result)
+        processed += len(events)
+        if len(events) < batch_size:
+            break
+    return processed
+
+
+def count_transitions(events):
+    """
+    Fold the status changes of the events into the per day counts.
+    """
+    deltas = defaultdict(int)
+    for event in events:
+        if (event.old_status is None or event.status is None or
+                event.old_status == event.status):
+            continue
+        day = to_current_timezone(event.created).date()
+        deltas[(day, event.old_status, event.status)] += 1
+    for (day, old_status, status), delta in sorted(deltas.items()):
+        TaskTransitionCount.add(day, old_status, status, delta)
+
+
+def update_transition_counts():
+    return consume(TRANSITION_COUNTS_CONSUMER, count_transitions)
+
+
+def get_transition_name(old_status, status):
+    for name, (sources, target) in Task.TRANSITIONS.items():
+        if old_status in sources and status == target:
+            return name
+
+
+def get_transition_counts(start=None, end=None):
+    """
+    Return the days from start to end and how many tasks made every
+    transition on each of them, after folding in the new events.
+    """
+    update_transition_counts()
+    end = min(end or local_today(), local_today())
+    start = start or end - datetime.timedelta(days=DEFAULT_DAYS - 1)
+    days = []
+    day = start
+    while day <= end:
+        days.append(day)
+        day += datetime.timedelta(days=1)
+    counts = defaultdict(int)
+    rows = (TaskTransitionCount.objects.filter(day__gte=start, day__lte=end)
+                                       .values_list('day', 'old_status',
+                                                    'status', 'count'))
+    for day, old_status, status, count in rows:
+        name = get_transition_name(old_status, status)
+        if name is not None:
+            counts[(name, day)] += count
+    transitions = OrderedDict([('days', days)])
+    for name in sorted(Task.TRANSITIONS):
+        transitions[name] = [counts[(name, day)] for day in days]
+    return transitions
@@ -0,0 +1,175 @@
+"""
+Streaming export of tasks as CSV or JSON lines.
+
+Rows are read in keyset chunks on the primary key as plain `values()`
+dicts, so memory stays flat however many tasks there are: Django does not
+use server side cursors, and `iterator()` still lets the database driver
+buffer the whole result.
+
+Archived tasks are exported along with the others, see `get_querysets`.
+"""
+import csv
+import heapq
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Task, TaskArchive
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (column, values() lookup) of every exported field.
+EXPORT_COLUMNS = (
+    ('id', 'pk'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('module', 'module'),
+    ('priority', 'priority'),
+    ('type', 'type'),
+    ('status', 'status'),
+    ('due_date', 'due_date'),
+    ('created', 'created'),
+    ('last_modified', 'last_modified'),
+    ('completed_at', 'completed_at'),
+    ('reviewed_at', 'reviewed_at'),
+    ('assigned_user', 'assigned_user__username'),
+    ('created_by', 'created_by__username'),
+    ('reviewed_by', 'reviewed_by__username'),
+)
+
+CHOICE_COLUMNS = {
+    'priority': Task.PRIORITY_CHOICES,
+    'type': Task.TYPE_CHOICES,
+    'status': Task.STATUS_CHOICES,
+}
+
+# Status filters by name, the ones the list views apply.
+STATUS_FILTERS = {
+    'open': {'status__in': Task.OPEN_STATUSES},
+    'incomplete': {'status': Task.STATUS_CHOICES.incomplete},
+    'ready_for_review': {'status': Task.STATUS_CHOICES.ready_for_review},
+    'complete': {'status': Task.STATUS_CHOICES.complete},
+}
+
+FORMATS = ('csv', 'jsonl')
+
+
+def filter_by_status(queryset, status):
+    """
+    Narrow the queryset by a name of `STATUS_FILTERS`, or not at all if the
+    status is empty. Raises KeyError for an unknown name.
+    """
+    if not status:
+        return queryset
+    return queryset.filter(**STATUS_FILTERS[status])
+
+
+def iter_values(queryset, lookups, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the `values()` rows of the queryset, including 'pk', in primary
+    key order, reading them one chunk at a time.
+    """
+    queryset = queryset.order_by('pk')
+    lookups = list(lookups)
+    if 'pk' not in lookups:
+        lookups.append('pk')
+    last_pk = None
+    while True:
+        chunk = queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk.values(*lookups)[:chunk_size])
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1]['pk']
+
+
+def get_querysets(status=None):
+    """
+    Return the tasks and the archived tasks in the given status, see
+    `filter_by_status`.
+    """
+    return [filter_by_status(model.objects.all(), status)
+            for model in (Task, TaskArchive)]
+
+
+def iter_merged_values(querysets, lookups, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Like `iter_values`, for a list of querysets whose rows never share a
+    primary key, merged in primary key order.
+    """
+    iterators = [((row['pk'], row) for row in iter_values(queryset, lookups,
+                                                          chunk_size))
+                 for queryset in querysets]
+    for pk, row in heapq.merge(*iterators):
+        yield row
+
+
+def iter_rows(querysets, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the export rows of the queryset, or of a list of querysets, as
+    dicts in primary key order.
+    """
+    if not isinstance(querysets, (list, tuple)):
+        querysets = [querysets]
+    lookups = [lookup for column, lookup in EXPORT_COLUMNS]
+    for row in iter_merged_values(querysets, lookups, chunk_size):
+        yield dict((column, get_value(column, row[lookup]))
+                   for column, lookup in EXPORT_COLUMNS)
+
+
+def get_value(column, value):
+    if value is not None and column in CHOICE_COLUMNS:
+        return CHOICE_COLUMNS[column][value]
+    return value
+
+
+class Echo(object):
+    """
+    A file-like object that hands back what is written to it, to get single
+    lines out of `csv.writer`.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """
+    Yield a header and then one CSV line per row.
+    """
+    columns = [column for column, lookup in EXPORT_COLUMNS]
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([format_csv_value(row[column])
+                               for column in columns])
+
+
+def format_csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_jsonl(rows):
+    """
+    Yield one JSON document per row and line.
+    """
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, sort_keys=True) + '\n'
+
+
+def iter_export(querysets, format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the lines of the export of the queryset, or of a list of
+    querysets, in the given format.
+    """
+    rows = iter_rows(querysets, chunk_size)
+    if format == 'jsonl':
+        return iter_jsonl(rows)
+    return iter_csv(rows)
@@ -0,0 +1,157 @@
+import hashlib
+import itertools
+from collections import defaultdict
+
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Task
+from .versions import bump_version, get_version
+
+
+# Facet counts are dropped whenever a task changes (see receivers), the
+# timeout only bounds writes that bypass the signals.
+FACET_CACHE_TIMEOUT = getattr(settings, 'TASK_FACET_CACHE_TIMEOUT', 300)
+
+GENERATION_KEY = 'tasks:facets:generation'
+
+# (field, label) of every facet, in the order they are shown.
+FACETS = (
+    ('module', 'Module'),
+    ('priority', 'Priority'),
+    ('type', 'Type'),
+    ('assigned_user', 'Assigned To'),
+)
+
+FACET_FIELDS = tuple(field for field, label in FACETS)
+
+
+class TaskFilterForm(forms.Form):
+    """
+    The facets and due date range a task list is narrowed by. Invalid values
+    are ignored rather than reported.
+    """
+    module = forms.CharField(required=False)
+    priority = forms.TypedChoiceField(choices=Task.PRIORITY_CHOICES,
+                                      coerce=int,
+                                      empty_value=None,
+                                      required=False)
+    type = forms.TypedChoiceField(choices=Task.TYPE_CHOICES,
+                                  coerce=int,
+                                  empty_value=None,
+                                  required=False)
+    assigned_user = forms.IntegerField(required=False)
+    due_after = forms.DateField(required=False)
+    due_before = forms.DateField(required=False)
+
+    def get_cleaned_data(self):
+        """
+        Return the valid, non empty values.
+        """
+        self.is_valid()
+        return dict((name, value)
+                    for name, value in self.cleaned_data.items()
+                    if value not in (None, ''))
+
+    def get_facet_filters(self):
+        data = self.get_cleaned_data()
+        return dict((field, data[field])
+                    for field in FACET_FIELDS if field in data)
+
+    def get_range_filters(self):
+        data = self.get_cleaned_data()
+        filters = {}
+        if 'due_after' in data:
+            filters['due_date__gte'] = data['due_after']
+        if 'due_before' in data:
+            filters['due_date__lte'] = data['due_before']
+        return filters
+
+
+def get_facet_label(field, value, username):
+    if field == 'priority':
+        return Task.PRIORITY_CHOICES[value]
+    if field == 'type':
+        return Task.TYPE_CHOICES[value]
+    if field == 'assigned_user':
+        return username or '(unassigned)'
+    return value or '(none)'
+
+
+def count_facets(querysets, selected):
+    """
+    Count the tasks of the querysets, e.g. of the task table and of the
+    archive, per value of every facet.
+
+    A facet is counted with the selections of the other facets applied but
+    not its own, so the counts show what picking another value would give.
+    All of them come from a single query per queryset grouped by every facet
+    field.
+    """
+    rows = itertools.chain.from_iterable(
+        queryset.order_by()
+                .values_list(*(FACET_FIELDS + ('assigned_user__username',)))
+                .annotate(Count('pk'))
+        for queryset in querysets)
+    counts = dict((field, defaultdict(int)) for field in FACET_FIELDS)
+    labels = {}
+    for row in rows:
+        values = dict(zip(FACET_FIELDS, row))
+        username, count = row[-2:]
+        mismatches = [field for field, value in selected.items()
+                      if values[field] != value]
+        if len(mismatches) > 1:
+            continue
+        for field, value in values.items():
+            if mismatches and mismatches != [field]:
+                continue
+            counts[field][value] += count
+            labels[(field, value)] = get_facet_label(field, value, username)
+    facets = []
+    for field, label in FACETS:
+        values = sorted(counts[field].items(),
+                        key=lambda item: (-item[1],
+                                          labels[(field, item[0])]))
+        facets.append({
+            'name': field,
+            'label': label,
+            'values': [{'value': value,
+                        'label': labels[(field, value)],
+                        'count': count,
+                        'selected': selected.get(field) == value,
+                        # Neither no module nor no assignee can be picked.
+                        'selectable': value not in (None, '')}
+                       for value, count in values],
+        })
+    return facets
+
+
+def get_facet_counts(querysets, selected, signature):
+    """
+    Return the facet counts of the querysets, cached under `signature`,
+    which must identify the querysets and the selection.
+    """
+    generation = get_facet_generation()
+    digest = hashlib.md5(signature.encode('utf-8')).hexdigest()
+    key = 'tasks:facets:%s:%s' % (generation, digest)
+    facets = cache.get(key)
+    if facets is None:
+        facets = count_facets(querysets, selected)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
+
+
+def get_facet_generation():
+    """
+    Return a version that changes whenever any task does.
+    """
+    return get_version(GENERATION_KEY)
+
+
+def invalidate_facet_counts():
+    """
+    Orphan every cached facet count by moving to a new generation.
+    """
+    bump_version(GENERATION_KEY)
@@ -0,0 +1,224 @@
+"""
+Bulk import of tasks from CSV or JSON lines, in the format `tasks.export`
+writes.
+"""
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import AutoField
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Task
+from .signals import TaskChange, tasks_changed
+
+
+IMPORT_BATCH_SIZE = 1000
+
+CHOICE_FIELDS = {
+    'priority': Task.PRIORITY_CHOICES,
+    'type': Task.TYPE_CHOICES,
+    'status': Task.STATUS_CHOICES,
+}
+
+USER_FIELDS = ('assigned_user', 'created_by', 'reviewed_by')
+
+# Imported as they are, so that a re-imported export keeps its history.
+DATETIME_FIELDS = ('created', 'last_modified', 'completed_at', 'reviewed_at')
+
+
+class RejectedRow(Exception):
+    """
+    Raised for a row that can not be turned into a task.
+    """
+
+
+def read_csv(stream):
+    """
+    Yield the line number and the row of every record, or a `RejectedRow`
+    instead of the row if the record is malformed.
+    """
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, RejectedRow('Malformed CSV: %s.' % e)
+        else:
+            yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    """
+    Yield the line number and the row of every non blank line, or a
+    `RejectedRow` instead of the row if the line is not a JSON object.
+    """
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, RejectedRow('Malformed JSON: %s.' % e)
+            continue
+        if not isinstance(row, dict):
+            yield number, RejectedRow('Not a JSON object.')
+            continue
+        yield number, row
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def get_choice_map(choices):
+    """
+    Map the database values and the labels of the choices, as strings and
+    in lower case, to the database values.
+    """
+    choice_map = {}
+    for value, label in choices:
+        choice_map[str(value)] = value
+        choice_map[str(label).lower()] = value
+    return choice_map
+
+
+class TaskImporter(object):
+    """
+    Turns rows into tasks and inserts them with one `bulk_create` per batch,
+    each batch in its own transaction.
+
+    Users are referenced by username and looked up in a map of all of them
+    that is read once.
+    """
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.user_ids = dict(get_user_model().objects
+                                             .values_list('username', 'pk'))
+        self.choice_maps = dict((field, get_choice_map(choices))
+                                for field, choices in CHOICE_FIELDS.items())
+        self.imported = 0
+        self.rejected = 0
+
+    def build_task(self, row):
+        """
+        Return an unsaved task for the row, or raise `RejectedRow`.
+        """
+        row = dict((key, str(value)) for key, value in row.items()
+                   if value not in (None, ''))
+        title = row.get('title', '').strip()
+        if not title:
+            raise RejectedRow('Title is missing.')
+        values = {'title': title}
+        for field in ('description', 'module'):
+            if field in row:
+                values[field] = row[field]
+        for field in ('title', 'module'):
+            max_length = Task._meta.get_field(field).max_length
+            if field in values and len(values[field]) > max_length:
+                raise RejectedRow('%s is longer than %d characters.' % (
+                                  field.capitalize(), max_length))
+        for field, choice_map in self.choice_maps.items():
+            if field in row:
+                try:
+                    values[field] = choice_map[row[field].lower()]
+                except KeyError:
+                    raise RejectedRow('Unknown %s %r.' % (field, row[field]))
+        # The forms require a due date, and the views expect one.
+        if 'due_date' not in row:
+            raise RejectedRow('Due date is missing.')
+        try:
+            values['due_date'] = parse_date(row['due_date'])
+        except ValueError:
+            values['due_date'] = None
+        if values['due_date'] is None:
+            raise RejectedRow('Invalid due date %r.' % row['due_date'])
+        now = timezone.now()
+        for field in DATETIME_FIELDS:
+            if field in row:
+                values[field] = self.parse_datetime(field, row[field])
+        values.setdefault('last_modified', now)
+        values.setdefault('created', min(values['last_modified'], now))
+        for field in USER_FIELDS:
+            if field in row:
+                try:
+                    values[field + '_id'] = self.user_ids[row[field]]
+                except KeyError:
+                    raise RejectedRow('Unknown user %r.' % row[field])
+        return Task(**values)
+
+    def parse_datetime(self, field, value):
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise RejectedRow('Invalid %s %r.' % (field.replace('_', ' '),
+                                                  value))
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed,
+                                         timezone.get_current_timezone())
+        return parsed
+
+    def import_rows(self, rows, on_batch=None, on_reject=None):
+        """
+        Import the (line number, row) pairs of a reader. `on_batch` is called
+        with the number of tasks imported after every batch, `on_reject`
+        with the line number and the `RejectedRow` of every row that is
+        skipped.
+        """
+        batch = []
+        for number, row in rows:
+            try:
+                if isinstance(row, RejectedRow):
+                    raise row
+                batch.append(self.build_task(row))
+            except RejectedRow as e:
+                self.rejected += 1
+                if on_reject is not None:
+                    on_reject(number, e)
+                continue
+            if len(batch) >= self.batch_size:
+                self.save_batch(batch)
+                batch = []
+                if on_batch is not None:
+                    on_batch(self.imported)
+        if batch:
+            self.save_batch(batch)
+            if on_batch is not None:
+                on_batch(self.imported)
+
+    def save_batch(self, batch):
+        with transaction.atomic():
+            insert_tasks(batch)
+        self.imported += len(batch)
+        # bulk_create sends no post_save, describe the new tasks so that the
+        # stats and counters follow. Their primary keys are not known.
+        attnames = dict((field, Task._meta.get_field(field).attname)
+                        for field in Task.tracker.fields)
+        tasks_changed.send(sender=Task, changes=[
+            TaskChange(None, None,
+                       dict((field, getattr(task, attname))
+                            for field, attname in attnames.items()))
+            for task in batch])
+
+
+def insert_tasks(tasks):
+    """
+    Insert the tasks like `bulk_create`, but with their `created` and
+    `last_modified` as they are instead of the time of the insert.
+    """
+    using = router.db_for_write(Task)
+    fields = [field for field in Task._meta.local_concrete_fields
+              if not isinstance(field, AutoField)]
+    batch_size = max(connections[using].ops.bulk_batch_size(fields, tasks), 1)
+    for start in range(0, len(tasks), batch_size):
+        # A raw insert skips the pre_save of the auto_now(_add) fields.
+        Task._base_manager._insert(tasks[start:start + batch_size],
+                                   fields=fields, using=using, raw=True)
@@ -0,0 +1,37 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from ...archive import (ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE,
+    archive_tasks, get_archive_cutoff)
+
+
+class Command(BaseCommand):
+    """
+    Move completed tasks that did not change for a while to the archive
+    table, e.g. nightly from cron::
+
+        ./manage.py archive_tasks --days 180
+    """
+    help = "Move old completed tasks to the archive."
+    option_list = BaseCommand.option_list + (
+        make_option('--days',
+                    type='int',
+                    default=ARCHIVE_AFTER_DAYS,
+                    help='Archive completed tasks unchanged for this many '
+                         'days.'),
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=ARCHIVE_BATCH_SIZE,
+                    help='Number of tasks moved per transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        def on_batch(archived):
+            self.stdout.write('Archived %d tasks.' % archived)
+
+        archived = archive_tasks(get_archive_cutoff(max(options['days'], 0)),
+                                 max(options['batch_size'], 1),
+                                 on_batch=on_batch)
+        self.stdout.write('Archived %d tasks in total.' % archived)
@@ -0,0 +1,172 @@
+import datetime
+import random
+import time
+from optparse import make_option
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.client import RequestFactory
+
+from ...counters import reset_status_counts
+from ...models import Task, TaskStats
+from ...pagination import CursorPaginator
+from ...tables import TaskTable
+from ...views import (ListTasksView, ListIncompleteTasksView,
+    ListUnReviewedTasksView, ListCompletedTasksView, ListOverdueTasksView,
+    ListDueTodayTasksView)
+
+
+LIST_VIEWS = (ListTasksView, ListIncompleteTasksView, ListUnReviewedTasksView,
+              ListCompletedTasksView, ListOverdueTasksView,
+              ListDueTodayTasksView)
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ANALYZE ',
+    'mysql': 'EXPLAIN ',
+}
+
+SEED_MODULES = ('CRM', 'HRMS', 'Billing', 'Inventory', 'Reports', '')
+
+SEED_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """
+    Print the query plan and the latency of the first page of every task
+    list view.
+
+    To compare access paths run it once with the list indexes and once
+    without them, e.g.::
+
+        ./manage.py benchmark_list_views --seed 200000
+        ./manage.py migrate tasks 0005
+        ./manage.py benchmark_list_views
+        ./manage.py migrate tasks
+    """
+    help = "Show query plan and latency of each task list view."
+    option_list = BaseCommand.option_list + (
+        make_option('--seed',
+                    type='int',
+                    default=0,
+                    help='Create this many synthetic tasks before measuring.'),
+        make_option('--repeat',
+                    type='int',
+                    default=5,
+                    help='Number of timed runs for each view.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed_tasks(options['seed'])
+        per_page = TaskTable._meta.per_page
+        for view_class in LIST_VIEWS:
+            view = self.get_view(view_class)
+            self.stdout.write(view_class.__name__)
+            for queryset in self.get_page_querysets(view, per_page):
+                for line in self.explain(queryset):
+                    self.stdout.write('    %s' % line)
+            timings = sorted(self.time_page(view, per_page)
+                             for _ in range(max(options['repeat'], 1)))
+            self.stdout.write('    min %.2f ms, median %.2f ms\n' % (
+                timings[0], timings[len(timings) // 2]))
+
+    def get_view(self, view_class):
+        view = view_class()
+        view.request = RequestFactory().get('/')
+        view.args = ()
+        view.kwargs = {}
+        return view
+
+    def get_view_querysets(self, view):
+        """
+        Return the querysets the view would hand to its table: the tasks
+        sorted the same way the table sorts them by default, or, for views
+        that page with a cursor, the tasks and the archived tasks.
+        """
+        if not view.cursor_pagination:
+            return [view.get_queryset().order_by(*TaskTable._meta.order_by)]
+        querysets = [view.get_queryset()]
+        if view.include_archive:
+            querysets.append(view.get_archive_queryset())
+        return querysets
+
+    def get_page_querysets(self, view, per_page):
+        """
+        Return the queries of the first page, as the view runs them.
+        """
+        querysets = self.get_view_querysets(view)
+        if not view.cursor_pagination:
+            return [querysets[0][:per_page]]
+        ordering = view.cursor_ordering
+        pk_ordering = '-pk' if ordering.startswith('-') else 'pk'
+        # The paginator reads one row more to know if there is a next page.
+        return [queryset.order_by(ordering, pk_ordering)[:per_page + 1]
+                for queryset in querysets]
+
+    def explain(self, queryset):
+        """
+        Return the lines of the database's plan for the queryset.
+        """
+        prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+        if prefix is None:
+            return ['(no query plan support for %s)' % connection.vendor]
+        sql, params = queryset.query.sql_with_params()
+        cursor = connection.cursor()
+        cursor.execute(prefix + sql, params)
+        if connection.vendor == 'sqlite':
+            # Only the last column of EXPLAIN QUERY PLAN carries the detail.
+            return [row[-1] for row in cursor.fetchall()]
+        return [' '.join(str(column) for column in row)
+                for row in cursor.fetchall()]
+
+    def time_page(self, view, per_page):
+        """
+        Time what the table costs: a count and the first page, or the first
+        page of the cursor paginator for views that page with a cursor.
+        """
+        querysets = self.get_view_querysets(view)
+        start = time.time()
+        if view.cursor_pagination:
+            CursorPaginator(querysets, per_page, view.cursor_ordering).page()
+        else:
+            querysets[0].count()
+            list(querysets[0][:per_page])
+        return (time.time() - start) * 1000
+
+    def seed_tasks(self, count):
+        """
+        Bulk insert synthetic tasks, mostly completed ones to mimic a long
+        history.
+        """
+        user_model = get_user_model()
+        user_ids = list(user_model.objects.values_list('pk', flat=True))
+        if not user_ids:
+            user_ids = [user_model.objects.create_user('benchmark').pk]
+        today = datetime.date.today()
+        statuses = ([Task.STATUS_CHOICES.complete] * 8 +
+                    [Task.STATUS_CHOICES.incomplete,
+                     Task.STATUS_CHOICES.ready_for_review])
+        created = 0
+        while created < count:
+            batch = []
+            for i in range(min(SEED_BATCH_SIZE, count - created)):
+                due_date = today + datetime.timedelta(
+                                        days=random.randint(-700, 60))
+                batch.append(Task(
+                    title='Benchmark task %d' % (created + i),
+                    due_date=due_date,
+                    module=random.choice(SEED_MODULES),
+                    priority=random.choice(list(Task.PRIORITY_CHOICES))[0],
+                    type=random.choice(list(Task.TYPE_CHOICES))[0],
+                    status=random.choice(statuses),
+                    assigned_user_id=random.choice(user_ids),
+                    created_by_id=random.choice(user_ids)))
+            with transaction.atomic():
+                Task.objects.bulk_create(batch)
+            created += len(batch)
+        # bulk_create sends no signals, so the stats and counters are stale.
+        TaskStats.rebuild()
+        reset_status_counts()
+        self.stdout.write('Created %d tasks.\n' % created)
@@ -0,0 +1,51 @@
+import io
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...export import (EXPORT_CHUNK_SIZE, FORMATS, STATUS_FILTERS,
+    get_querysets, iter_export)
+
+
+class Command(BaseCommand):
+    """
+    Export every task, archived ones included, or those in one status, as
+    CSV or JSON lines::
+
+        ./manage.py export_tasks --format jsonl --output tasks.jsonl
+    """
+    help = "Stream all tasks as CSV or JSON lines."
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+                    choices=FORMATS,
+                    default='csv',
+                    help='Output format, one of %s.' % ', '.join(FORMATS)),
+        make_option('--status',
+                    default='',
+                    help='Only export the tasks in this status, one of %s.' %
+                         ', '.join(sorted(STATUS_FILTERS))),
+        make_option('--output',
+                    default=None,
+                    help='File to write to instead of standard output.'),
+        make_option('--chunk-size',
+                    type='int',
+                    dest='chunk_size',
+                    default=EXPORT_CHUNK_SIZE,
+                    help='Number of tasks read per query.'),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            querysets = get_querysets(options['status'])
+        except KeyError:
+            raise CommandError('Unknown status %r.' % options['status'])
+        lines = iter_export(querysets, options['format'],
+                            max(options['chunk_size'], 1))
+        if options['output']:
+            with io.open(options['output'], 'w', encoding='utf-8',
+                         newline='') as output:
+                for line in lines:
+                    output.write(line)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
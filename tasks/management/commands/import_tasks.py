@@ -0,0 +1,65 @@
+import io
+import os
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importer import IMPORT_BATCH_SIZE, READERS, TaskImporter
+from ...throughput import invalidate_throughput
+
+
+class Command(BaseCommand):
+    """
+    Import tasks from a CSV or JSON lines file with the columns written by
+    export_tasks::
+
+        ./manage.py import_tasks backlog.csv
+
+    Choices can be given by value or by label, users by username. The
+    timestamps of the rows are kept. Rows that do not validate are reported
+    with their line number and skipped.
+    """
+    args = '<file>'
+    help = "Bulk import tasks from a CSV or JSON lines file."
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+                    choices=sorted(READERS),
+                    default=None,
+                    help='Input format, guessed from the file extension '
+                         'by default.'),
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=IMPORT_BATCH_SIZE,
+                    help='Number of tasks inserted per transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the file to import.')
+        path = args[0]
+        format = options['format'] or os.path.splitext(path)[1].lstrip('.')
+        if format not in READERS:
+            raise CommandError('Unknown format %r, use --format.' % format)
+        importer = TaskImporter(max(options['batch_size'], 1))
+        start = time.time()
+
+        def on_batch(imported):
+            self.stdout.write('Imported %d tasks (%.0f/s).' % (
+                imported, imported / max(time.time() - start, 1e-6)))
+
+        def on_reject(number, error):
+            self.stderr.write('Line %d rejected: %s' % (number, error))
+
+        with io.open(path, encoding='utf-8', newline='') as stream:
+            importer.import_rows(READERS[format](stream),
+                                 on_batch=on_batch,
+                                 on_reject=on_reject)
+        elapsed = time.time() - start
+        if importer.imported:
+            # The tasks may fall into report buckets that are cached as
+            # closed.
+            invalidate_throughput()
+        self.stdout.write('Imported %d tasks, rejected %d rows in %.1f s.' % (
+            importer.imported, importer.rejected, elapsed))
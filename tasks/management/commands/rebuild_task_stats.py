@@ -0,0 +1,35 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...counters import reset_status_counts
+from ...models import Task, TaskStats
+
+
+class Command(BaseCommand):
+    """
+    Recount the report statistics from the task table, or with --check only
+    report the counts that drifted from it.
+    """
+    help = "Rebuild the task stats table or check it for drift."
+    option_list = BaseCommand.option_list + (
+        make_option('--check',
+                    action='store_true',
+                    default=False,
+                    help='Only report drift, exit with an error if any.'),
+    )
+
+    def handle(self, *args, **options):
+        drift = TaskStats.find_drift()
+        for (status, module), (stored, actual) in sorted(drift.items()):
+            self.stdout.write('%s / %s: stored %d, actual %d' % (
+                Task.STATUS_CHOICES[status], module or '(no module)',
+                stored, actual))
+        if options['check']:
+            if drift:
+                raise CommandError('%d task stats drifted.' % len(drift))
+            self.stdout.write('Task stats are in sync.')
+            return
+        TaskStats.rebuild()
+        reset_status_counts()
+        self.stdout.write('Rebuilt task stats, fixed %d drifted.' % len(drift))
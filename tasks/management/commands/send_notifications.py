@@ -0,0 +1,45 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...notifications import Mailer, send_notifications
+
+
+class Command(BaseCommand):
+    """
+    Email digests of the transitions and assignments since the last run,
+    from cron or as a long running worker::
+
+        ./manage.py send_notifications --loop --interval 60
+
+    The longer the interval, the more changes every digest gathers.
+    """
+    help = "Send the notification digests of recent task changes."
+    option_list = BaseCommand.option_list + (
+        make_option('--loop',
+                    action='store_true',
+                    default=False,
+                    help='Keep running, sending every --interval seconds.'),
+        make_option('--interval',
+                    type='int',
+                    default=60,
+                    help='Seconds between two runs with --loop.'),
+    )
+
+    def handle(self, *args, **options):
+        mailer = Mailer()
+        try:
+            while True:
+                processed = send_notifications(mailer)
+                if processed:
+                    self.stdout.write('Processed %d events.' % processed)
+                if not options['loop']:
+                    break
+                # Hold neither a database nor an SMTP connection while idle.
+                connection.close()
+                mailer.close()
+                time.sleep(max(options['interval'], 1))
+        finally:
+            mailer.close()
@@ -0,0 +1,48 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...webhooks import WEBHOOK_WORKERS, Dispatcher, send_webhooks
+
+
+class Command(BaseCommand):
+    """
+    Post the webhooks of the task creations and transitions since the last
+    run, and retry the failed ones that are due, from cron or as a long
+    running worker::
+
+        ./manage.py send_webhooks --loop --interval 5 --workers 8
+    """
+    help = "Queue and post the webhooks of recent task changes."
+    option_list = BaseCommand.option_list + (
+        make_option('--loop',
+                    action='store_true',
+                    default=False,
+                    help='Keep running, posting every --interval seconds.'),
+        make_option('--interval',
+                    type='int',
+                    default=5,
+                    help='Seconds between two runs with --loop.'),
+        make_option('--workers',
+                    type='int',
+                    default=WEBHOOK_WORKERS,
+                    help='Number of deliveries posted at the same time.'),
+    )
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher(workers=max(options['workers'], 1))
+        try:
+            while True:
+                posted = send_webhooks(dispatcher)
+                if posted:
+                    self.stdout.write('Posted %d deliveries.' % posted)
+                if not options['loop']:
+                    break
+                # Go on right away while there is a backlog.
+                if not posted:
+                    connection.close()
+                    time.sleep(max(options['interval'], 1))
+        finally:
+            dispatcher.close()
@@ -1,10 +1,18 @@
-from django.db import models
+from collections import defaultdict, OrderedDict
+
+from django.db import models, connection, transaction, IntegrityError
+from django.db.models import Count, F
+from django.db.models.query import QuerySet
 from django.conf import settings
 from django.core.urlresolvers import reverse_lazy
 from django.utils import timezone
 from django.forms.util import to_current_timezone
 
-from model_utils import Choices
+from model_utils import Choices, FieldTracker
+from model_utils.managers import PassThroughManager
+
+from . import search
+from .signals import TaskChange, tasks_changed
 
 class TimeStampedModel(models.Model):
     """
@@ -17,7 +25,194 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
-class Task(TimeStampedModel):
+def local_today():
+    """
+    Return today's date in the current timezone.
+    """
+    # Convert to current tz, otherwise we are comparing with utc. the date
+    # will be entered respect to our current tz
+    return to_current_timezone(timezone.now()).date()
+
+
+class TransitionConflict(Exception):
+    """
+    Raised when a task is not in a state the transition can start from,
+    usually because somebody else changed it first.
+    """
+
+
+class TransitionResult(object):
+    """
+    Outcome of a transition applied to many tasks: the pks that moved and a
+    {pk: reason} dict of those that did not.
+    """
+    def __init__(self, succeeded=None, failed=None):
+        self.succeeded = succeeded or []
+        self.failed = failed or {}
+
+
+class TaskQuerySet(QuerySet):
+    def with_due_flags(self, today=None):
+        """
+        Annotate the tasks with `overdue` and `due_today`, computed by the
+        database against a single `today`. They can be sorted on, but not
+        filtered on: `filter()` does not see `extra()` columns, filter on
+        `due_date` and `status` instead.
+        """
+        if today is None:
+            today = local_today()
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        due_date = '%s.%s' % (table, qn('due_date'))
+        status = '%s.%s' % (table, qn('status'))
+        select = OrderedDict([
+            ('overdue', '%s < %%s AND %s <> %%s' % (due_date, status)),
+            ('due_today', '%s = %%s' % due_date),
+        ])
+        return self.extra(select=select,
+                          select_params=(today,
+                                         self.model.STATUS_CHOICES.complete,
+                                         today))
+
+    def search(self, query):
+        """
+        Narrow to the tasks whose title or description matches the query,
+        ranked by relevance. See `tasks.search`.
+        """
+        return search.search(self, query)
+
+    def apply_transition(self, name, user=None):
+        """
+        Apply the named transition to every task in this queryset, skipping
+        tasks whose status does not allow it.
+
+        Tasks are moved with one UPDATE per source status that is guarded by
+        that status and by the filters of this queryset, so a task somebody
+        else changed in the meantime is reported as failed instead of being
+        overwritten.
+        """
+        sources, target = self.model.TRANSITIONS[name]
+        # Read just the tracked fields, they are all we need to validate the
+        # transition and to describe the changes.
+        fields = sorted(self.model.tracker.fields)
+        rows = dict((row.pop('pk'), row)
+                    for row in self.order_by().values('pk', *fields))
+        result = TransitionResult()
+        eligible = defaultdict(list)
+        for pk, row in sorted(rows.items()):
+            if row['status'] in sources:
+                eligible[row['status']].append(pk)
+            else:
+                result.failed[pk] = 'Task is %s.' % (
+                                    self.model.STATUS_CHOICES[row['status']])
+        now = timezone.now()
+        updates = self.model.get_transition_updates(name, user, now)
+        updates.update(status=target, last_modified=now)
+        changes = []
+        for source, pks in sorted(eligible.items()):
+            guarded = self.filter(pk__in=pks, status=source)
+            if guarded.update(**updates) == len(pks):
+                moved = pks
+            else:
+                # Some tasks changed since we read them, find out which ones
+                # this UPDATE moved.
+                moved = set(self.model.objects.filter(pk__in=pks,
+                                                      status=target,
+                                                      last_modified=now)
+                                              .values_list('pk', flat=True))
+            for pk in pks:
+                if pk in moved:
+                    result.succeeded.append(pk)
+                    new = dict(rows[pk], status=target)
+                    changes.append(TaskChange(pk, rows[pk], new))
+                else:
+                    result.failed[pk] = 'Task was changed by someone else.'
+        if changes:
+            tasks_changed.send(sender=self.model, changes=changes, user=user)
+        return result
+
+    def transition(self, pk, name, user=None, last_modified=None):
+        """
+        Apply the named transition to a single task. If `last_modified` is
+        given the task must not have changed since then.
+
+        Raises `DoesNotExist` for an unknown task and `TransitionConflict`
+        if the task can not make the transition (anymore).
+        """
+        queryset = self.filter(pk=pk)
+        if last_modified is not None:
+            queryset = queryset.filter(last_modified=last_modified)
+        result = queryset.apply_transition(name, user)
+        if pk in result.failed:
+            raise TransitionConflict(result.failed[pk])
+        if not result.succeeded:
+            if last_modified is not None and self.filter(pk=pk).exists():
+                raise TransitionConflict('Task was changed by someone else.')
+            raise self.model.DoesNotExist('Task %s does not exist.' % pk)
+
+
+class TaskMixin(object):
+    """
+    Behaviour shared by tasks and their archived copies.
+    """
+    is_archived = False
+
+    def is_due(self):
+        """
+        Return True if this task crossed due date, otherwise false. Tasks
+        without a due date are never due.
+        """
+        if self.due_date is None:
+            return False
+        if not self.is_complete() and self.due_date < local_today():
+            return True
+        else:
+            return False
+
+    def is_due_today(self):
+        """
+        Check if the task due date is today
+        """
+        if self.due_date == local_today():
+            return True
+        else:
+            return False
+
+    def is_complete(self):
+        """
+        Returns True if the task is marked as completed.
+        """
+        if self.status == self.STATUS_CHOICES.complete:
+            return True
+        else:
+            return False
+
+    def is_ready_for_review(self):
+        """
+        Returns True if the task is marked as ready for review.
+        """
+        if self.status == self.STATUS_CHOICES.ready_for_review:
+            return True
+        else:
+            return False
+
+    def is_incomplete(self):
+        """
+        Returns True if the task is marked as not completed.
+        """
+        if self.status == self.STATUS_CHOICES.incomplete:
+            return True
+        else:
+            return False
+
+    def get_absolute_url(self):
+        return reverse_lazy('task_detail', kwargs={'pk': self.pk})
+
+    def __str__(self):
+        return self.title
+
+
+class Task(TaskMixin, TimeStampedModel):
     """
     Model that represent a task.
     """
@@ -61,61 +256,331 @@ class Task(TimeStampedModel):
                                     blank=True,
                                     editable=False,
                                     related_name='reviewed_tasks')
+    # Time at which the reviewer completed it
+    reviewed_at = models.DateTimeField(null=True,
+                                       blank=True,
+                                       editable=False)
+    # Number of visible follow up comments, kept up to date by the receivers
+    # so that lists can show it without touching the comments table.
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Transition name -> (statuses it can start from, status it leads to).
+    TRANSITIONS = {
+        'ready': ((STATUS_CHOICES.incomplete,),
+                  STATUS_CHOICES.ready_for_review),
+        # Completed tasks can be reopened.
+        'incomplete': ((STATUS_CHOICES.ready_for_review,
+                        STATUS_CHOICES.complete),
+                       STATUS_CHOICES.incomplete),
+        'complete': ((STATUS_CHOICES.incomplete,
+                      STATUS_CHOICES.ready_for_review),
+                     STATUS_CHOICES.complete),
+    }
+
+    # Statuses of the tasks that still need work.
+    OPEN_STATUSES = (STATUS_CHOICES.incomplete, STATUS_CHOICES.ready_for_review)
+
+    # Fields whose changes are announced through `signals.tasks_changed`.
+    # The user saving a task can be set as its `changed_by` attribute to go
+    # with the announcement.
+    tracker = FieldTracker(fields=['status', 'module', 'assigned_user',
+                                   'due_date'])
+
+    objects = PassThroughManager.for_queryset_class(TaskQuerySet)()
 
     class Meta:
         ordering = ['-created']
+        # Composite indexes matching the access paths of the list views: every
+        # list filters on status and sorts on due_date or created, per user
+        # lookups narrow by assignee first and the reports group by module.
+        # The id closes the (status, created) index so that cursor pages can
+        # seek on (created, id) without sorting ties.
+        index_together = [
+            ['status', 'due_date'],
+            ['status', 'created', 'id'],
+            ['assigned_user', 'status', 'due_date'],
+            ['module', 'status'],
+        ]
 
-    def is_due(self):
+    @classmethod
+    def get_transition_updates(cls, name, user, now):
         """
-        Return True if this task crossed due date, otherwise false.
+        Return the fields, besides status, that the named transition sets.
         """
-        # Convert to current tz, otherwise we are comparing with utc. the date
-        # will be entered respect to our current tz
-        date_now = to_current_timezone(timezone.now()).date()
-        if not self.is_complete() and self.due_date < date_now:
-            return True
-        else:
-            return False
+        if name == 'ready':
+            return {'completed_at': now}
+        if name == 'complete':
+            return {'reviewed_by': user, 'reviewed_at': now}
+        return {}
 
-    def is_due_today(self):
+
+class TaskArchiveQuerySet(QuerySet):
+    def search(self, query):
         """
-        Check if the task due date is today
+        Narrow to the tasks whose title or description contains every word
+        of the query. The archive has no full text index.
         """
-        date_now = to_current_timezone(timezone.now()).date()
-        if self.due_date == date_now:
-            return True
-        else:
-            return False
+        return search.match_terms(self, query)
 
-    def is_complete(self):
+
+class TaskArchive(TaskMixin, models.Model):
+    """
+    A completed task moved out of the task table by the `archive_tasks`
+    command, so that the table the open work lives in stays small. It keeps
+    the primary key of the task, links and comments stay valid.
+
+    Archived tasks are read only, and still counted by the task stats.
+    """
+    PRIORITY_CHOICES = Task.PRIORITY_CHOICES
+    TYPE_CHOICES = Task.TYPE_CHOICES
+    STATUS_CHOICES = Task.STATUS_CHOICES
+
+    id = models.IntegerField(primary_key=True)
+    created = models.DateTimeField()
+    last_modified = models.DateTimeField()
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                   null=True,
+                                   blank=True,
+                                   related_name='+')
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    due_date = models.DateField(null=True)
+    module = models.CharField(max_length=100, blank=True)
+    priority = models.PositiveIntegerField(choices=PRIORITY_CHOICES)
+    assigned_user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                      null=True,
+                                      blank=True,
+                                      verbose_name="Assigned To",
+                                      related_name='+')
+    type = models.PositiveIntegerField(choices=TYPE_CHOICES)
+    status = models.PositiveIntegerField(choices=STATUS_CHOICES)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    reviewed_by = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                    null=True,
+                                    blank=True,
+                                    related_name='+')
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    comment_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    is_archived = True
+
+    objects = PassThroughManager.for_queryset_class(TaskArchiveQuerySet)()
+
+    class Meta:
+        ordering = ['-created']
+        # The completed list pages through the archive on (created, id).
+        index_together = [
+            ['created', 'id'],
+        ]
+
+
+class TaskStats(models.Model):
+    """
+    Number of tasks per status and module, kept up to date with deltas as
+    tasks change so that reports never have to aggregate the task table.
+    """
+    status = models.PositiveIntegerField(choices=Task.STATUS_CHOICES)
+    module = models.CharField(max_length=100, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('status', 'module')
+        verbose_name_plural = 'task stats'
+
+    @classmethod
+    def apply_changes(cls, changes):
         """
-        Returns True if the task is marked as completed.
+        Move the counts by the given `TaskChange` list.
         """
-        if self.status == self.STATUS_CHOICES.complete:
-            return True
-        else:
-            return False
+        deltas = defaultdict(int)
+        for change in changes:
+            if not (change.has_changed('status') or
+                    change.has_changed('module')):
+                continue
+            if change.old is not None:
+                deltas[(change.get_old('status'),
+                        change.get_old('module'))] -= 1
+            if change.new is not None:
+                deltas[(change.get_new('status'),
+                        change.get_new('module'))] += 1
+        for (status, module), delta in deltas.items():
+            if delta:
+                cls.add(status, module, delta)
 
-    def is_ready_for_review(self):
+    @classmethod
+    def add(cls, status, module, delta):
         """
-        Returns True if the task is marked as ready for review.
+        Atomically add delta to the count of a status and module.
         """
-        if self.status == self.STATUS_CHOICES.ready_for_review:
-            return True
-        else:
-            return False
+        rows = cls.objects.filter(status=status, module=module)
+        if rows.update(count=F('count') + delta):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(status=status, module=module, count=delta)
+        except IntegrityError:
+            # Somebody else created the row in the meantime.
+            rows.update(count=F('count') + delta)
 
-    def is_incomplete(self):
+    @classmethod
+    def count_tasks(cls):
         """
-        Returns True if the task is marked as not completed.
+        Return the actual counts, archived tasks included, as a
+        {(status, module): count} dict.
         """
-        if self.status == self.STATUS_CHOICES.incomplete:
-            return True
-        else:
-            return False
+        # Clear the default ordering, otherwise 'created' ends up in the
+        # GROUP BY.
+        counts = defaultdict(int)
+        # Archived tasks are still counted.
+        for model in (Task, TaskArchive):
+            rows = (model.objects.order_by()
+                                 .values_list('status', 'module')
+                                 .annotate(Count('pk')))
+            for status, module, count in rows:
+                counts[(status, module)] += count
+        return dict(counts)
 
-    def get_absolute_url(self):
-        return reverse_lazy('task_detail', kwargs={'pk': self.pk})
+    @classmethod
+    def find_drift(cls):
+        """
+        Return a {(status, module): (stored, actual)} dict of the counts that
+        differ from the task table.
+        """
+        actual = cls.count_tasks()
+        stored = dict(((stats.status, stats.module), stats.count)
+                      for stats in cls.objects.all())
+        drift = {}
+        for key in set(actual) | set(stored):
+            if stored.get(key, 0) != actual.get(key, 0):
+                drift[key] = (stored.get(key, 0), actual.get(key, 0))
+        return drift
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls):
+        """
+        Recount everything from the task table.
+        """
+        cls.objects.all().delete()
+        cls.objects.bulk_create([
+            cls(status=status, module=module, count=count)
+            for (status, module), count in cls.count_tasks().items()])
+
+
+class TaskEvent(models.Model):
+    """
+    One row per change of a task, appended whenever `tasks_changed` is sent
+    and never updated, so history can be replayed and reports can fold in
+    just the events they have not seen yet (see `tasks.events`).
+
+    Only the tracked fields are recorded, the old values along with the new
+    ones where a report needs both sides of the change. `task_id` is None
+    for tasks created in bulk, whose primary keys are not known.
+    """
+    KIND_CHOICES = Choices((1, 'created', 'Created'),
+                           (2, 'edited', 'Edited'),
+                           (3, 'assigned', 'Assigned'),
+                           (4, 'transitioned', 'Transitioned'),
+                           (5, 'deleted', 'Deleted'))
+    task_id = models.IntegerField(null=True)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    # Who made the change, if it was made by a user.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             null=True,
+                             blank=True,
+                             on_delete=models.SET_NULL,
+                             related_name='+')
+    created = models.DateTimeField()
+    old_status = models.PositiveIntegerField(null=True)
+    status = models.PositiveIntegerField(null=True)
+    old_module = models.CharField(max_length=100, null=True)
+    module = models.CharField(max_length=100, null=True)
+    old_assigned_user_id = models.IntegerField(null=True)
+    assigned_user_id = models.IntegerField(null=True)
+    due_date = models.DateField(null=True)
+
+    class Meta:
+        ordering = ['id']
+        # The history of a single task.
+        index_together = [
+            ['task_id', 'id'],
+        ]
+
+
+class TaskEventCursor(models.Model):
+    """
+    How far a consumer of the event log got.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    last_event_id = models.IntegerField(default=0)
+
+
+class TaskTransitionCount(models.Model):
+    """
+    Number of tasks that moved from one status to another per day, folded
+    in from the event log.
+    """
+    day = models.DateField()
+    old_status = models.PositiveIntegerField(choices=Task.STATUS_CHOICES)
+    status = models.PositiveIntegerField(choices=Task.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'old_status', 'status')
+
+    @classmethod
+    def add(cls, day, old_status, status, delta):
+        # Only the consumer holding the lock on its cursor writes here, so
+        # the row can not be created concurrently.
+        rows = cls.objects.filter(day=day, old_status=old_status,
+                                  status=status)
+        if not rows.update(count=F('count') + delta):
+            cls.objects.create(day=day, old_status=old_status,
+                               status=status, count=delta)
+
+
+class WebhookEndpoint(models.Model):
+    """
+    A URL that is sent the creations and transitions of tasks, signed with
+    its secret. See `tasks.webhooks`.
+    """
+    url = models.URLField()
+    secret = models.CharField(max_length=100)
+    is_active = models.BooleanField(default=True)
+    # Deliveries per second, with bursts of up to as many.
+    rate_limit = models.FloatField(default=5)
 
     def __str__(self):
-        return self.title
+        return self.url
+
+
+class WebhookDelivery(models.Model):
+    """
+    The outbox: one row per event and endpoint, retried until the endpoint
+    accepts it or the attempts run out, after which it is kept as dead.
+    """
+    STATUS_CHOICES = Choices((1, 'pending', 'Pending'),
+                             (2, 'delivered', 'Delivered'),
+                             (3, 'dead', 'Dead'))
+    endpoint = models.ForeignKey(WebhookEndpoint, related_name='deliveries')
+    event_id = models.IntegerField()
+    payload = models.TextField()
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES,
+                                              default=STATUS_CHOICES.pending)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        unique_together = ('endpoint', 'event_id')
+        # The deliveries that are due.
+        index_together = [
+            ['status', 'next_attempt_at'],
+        ]
+
+
+# Connect the receivers that keep derived data in sync with tasks.
+from . import receivers
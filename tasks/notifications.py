@@ -0,0 +1,175 @@
+"""
+Email notifications of transitions and assignments.
+
+Requests do not send anything: the changes are already appended to the
+event log (see `tasks.events`), and the `send_notifications` command reads
+them from there in the background. The events of a batch are coalesced
+into one digest per recipient, and the digests go out once the batch is
+committed, over a single SMTP connection that is reused until it fails.
+Digests of a run that dies before sending them are lost, like those the
+mail server keeps refusing.
+"""
+import logging
+import smtplib
+import socket
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.core.urlresolvers import reverse
+
+from .events import consume
+from .models import Task, TaskArchive, TaskEvent
+
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS_CONSUMER = 'notifications'
+
+# Delivery attempts per run, waiting BACKOFF, 2 * BACKOFF, ... seconds in
+# between.
+SEND_ATTEMPTS = 4
+SEND_BACKOFF = 2
+
+
+def get_messages(event, reviewer_pks):
+    """
+    Return (user pk, text) pairs for everybody the event concerns.
+    """
+    statuses = Task.STATUS_CHOICES
+    messages = []
+    if event.kind == TaskEvent.KIND_CHOICES.transitioned:
+        if event.status == statuses.ready_for_review:
+            messages.extend((pk, 'is ready for review')
+                            for pk in reviewer_pks)
+        elif event.status == statuses.incomplete:
+            messages.append((event.assigned_user_id,
+                             'was sent back as incomplete'))
+        elif event.status == statuses.complete:
+            messages.append((event.assigned_user_id, 'was completed'))
+    if (event.kind != TaskEvent.KIND_CHOICES.deleted and
+            event.old_assigned_user_id != event.assigned_user_id):
+        messages.append((event.assigned_user_id, 'was assigned to you'))
+    # Nobody is told about their own changes.
+    return [(pk, text) for pk, text in messages
+            if pk is not None and pk != event.user_id]
+
+
+def get_task_titles(pks):
+    titles = {}
+    for model in (Task, TaskArchive):
+        titles.update(model.objects.filter(pk__in=pks)
+                                   .values_list('pk', 'title'))
+    return titles
+
+
+def build_digests(events):
+    """
+    Return one email per recipient listing what happened to the tasks of
+    the events that concern them. Reads the reviewers, the recipients and
+    the task titles with one query each.
+    """
+    User = get_user_model()
+    reviewer_pks = list(User.objects.filter(is_staff=True, is_active=True)
+                                    .values_list('pk', flat=True))
+    lines = OrderedDict()
+    for event in events:
+        if event.task_id is None:
+            continue
+        for pk, text in get_messages(event, reviewer_pks):
+            lines.setdefault(pk, []).append((event.task_id, text))
+    if not lines:
+        return []
+    recipients = dict((user.pk, user) for user in
+                      User.objects.filter(pk__in=list(lines), is_active=True)
+                                  .exclude(email=''))
+    titles = get_task_titles(set(task_pk for user_lines in lines.values()
+                                 for task_pk, text in user_lines))
+    domain = Site.objects.get_current().domain
+    digests = []
+    for pk, user_lines in lines.items():
+        if pk not in recipients:
+            continue
+        body = '\n'.join(
+            '- %s %s\n  http://%s%s' % (
+                titles.get(task_pk, 'Task #%d' % task_pk), text, domain,
+                reverse('task_detail', kwargs={'pk': task_pk}))
+            for task_pk, text in user_lines)
+        digests.append(EmailMessage(
+            subject='%d task update(s)' % len(user_lines),
+            body=body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[recipients[pk].email]))
+    return digests
+
+
+class Mailer(object):
+    """
+    Sends emails over one connection that is kept open until it fails or
+    the mailer is closed. Failed sends are retried on a new connection
+    with exponential backoff, messages that still fail are dropped and
+    logged rather than blocking the ones after them.
+
+    The backend defaults to `TASK_NOTIFICATION_EMAIL_BACKEND`, or to
+    `EMAIL_BACKEND` if that is not set.
+    """
+    def __init__(self, backend=None, attempts=SEND_ATTEMPTS,
+                 backoff=SEND_BACKOFF, sleep=time.sleep):
+        self.backend = backend or getattr(
+                            settings, 'TASK_NOTIFICATION_EMAIL_BACKEND', None)
+        self.attempts = attempts
+        self.backoff = backoff
+        self.sleep = sleep
+        self.connection = None
+
+    def send(self, messages):
+        """
+        Send the messages and return how many were given up on.
+        """
+        pending = list(messages)
+        for attempt in range(self.attempts):
+            try:
+                if self.connection is None:
+                    self.connection = get_connection(self.backend,
+                                                     fail_silently=False)
+                    self.connection.open()
+                while pending:
+                    self.connection.send_messages(pending[:1])
+                    pending.pop(0)
+                return 0
+            except (smtplib.SMTPException, socket.error) as e:
+                logger.warning("Sending notifications failed: %s", e)
+                self.close()
+                if attempt + 1 < self.attempts:
+                    self.sleep(self.backoff * 2 ** attempt)
+        logger.error("Gave up on %d notification(s).", len(pending))
+        return len(pending)
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (smtplib.SMTPException, socket.error):
+                pass
+            self.connection = None
+
+
+def send_notifications(mailer=None):
+    """
+    Send the digests of the events since the last run and return how many
+    events were processed. Events from before the first run are skipped.
+    """
+    own_mailer = mailer is None
+    if own_mailer:
+        mailer = Mailer()
+    try:
+        # The digests are sent after the cursor moved on, so that neither
+        # the cursor lock nor the transaction wait for the mail server.
+        return consume(NOTIFICATIONS_CONSUMER, build_digests,
+                       from_end=True, after_batch=mailer.send)
+    finally:
+        if own_mailer:
+            mailer.close()
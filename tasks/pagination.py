@@ -0,0 +1,128 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a cursor token is malformed or was tampered with.
+    """
+
+
+class CursorPage(object):
+    """
+    A page of results together with the opaque tokens of its neighbours.
+    """
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator(object):
+    """
+    Paginates a queryset by seeking past the sort key of the last row seen
+    instead of skipping rows with OFFSET. Every page is a single index range
+    scan and no COUNT(*) is ever needed.
+
+    `ordering` names one non nullable field, optionally prefixed with '-'.
+    The primary key is always appended as a tiebreaker so that the order is
+    total. Works for model instances as well as `values()` rows that carry
+    the field and 'pk'.
+
+    A list of querysets whose rows never share a primary key can be given
+    instead of one, their pages are merged as if they were a single one.
+    """
+    def __init__(self, queryset, per_page, ordering='-created'):
+        if isinstance(queryset, (list, tuple)):
+            self.querysets = list(queryset)
+        else:
+            self.querysets = [queryset]
+        self.per_page = per_page
+        self.descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        self.field = self.querysets[0].model._meta.get_field(self.field_name)
+
+    def page(self, cursor=None):
+        """
+        Return the page that follows (or precedes) the given cursor, or the
+        first page if there is no cursor.
+        """
+        backwards = False
+        seek = None
+        if cursor:
+            value, pk, backwards = self.decode_cursor(cursor)
+            seek = self._seek_filter(value, pk, backwards)
+        rows = []
+        for queryset in self.querysets:
+            if seek is not None:
+                queryset = queryset.filter(seek)
+            rows.extend(self._order(queryset, backwards)[:self.per_page + 1])
+        if len(self.querysets) > 1:
+            rows.sort(key=self._get_key,
+                      reverse=self.descending != backwards)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+        if not rows:
+            return CursorPage(rows)
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_next else None,
+            previous_cursor=(self.encode_cursor(rows[0], backwards=True)
+                             if has_previous else None))
+
+    def encode_cursor(self, row, backwards=False):
+        """
+        Build the token that seeks past `row` in the given direction.
+        """
+        value, pk = self._get_key(row)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        payload = json.dumps([value, pk, int(backwards)]).encode('utf-8')
+        return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Return the (value, pk, backwards) triple stored in a token.
+        """
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            payload = base64.urlsafe_b64decode(
+                            (cursor + padding).encode('ascii'))
+            value, pk, backwards = json.loads(payload.decode('utf-8'))
+            return self.field.to_python(value), int(pk), bool(backwards)
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _get_key(self, row):
+        if isinstance(row, dict):
+            return row[self.field_name], row['pk']
+        return getattr(row, self.field.attname), row.pk
+
+    def _order(self, queryset, backwards):
+        prefix = '-' if self.descending != backwards else ''
+        return queryset.order_by(prefix + self.field_name, prefix + 'pk')
+
+    def _seek_filter(self, value, pk, backwards):
+        lookup = 'lt' if self.descending != backwards else 'gt'
+        return (Q(**{'%s__%s' % (self.field_name, lookup): value}) |
+                Q(**{self.field_name: value, 'pk__%s' % lookup: pk}))
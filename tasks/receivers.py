@@ -0,0 +1,104 @@
+from django.contrib import comments
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+# The models import this module once they are defined. The modules that
+# import the models in turn (archive, counters, events, facets, workload)
+# are imported in the receivers that use them: importing them here breaks
+# whenever one of them is the first to import the models.
+from .models import Task, TaskArchive, TaskStats
+from .signals import TaskChange, tasks_changed
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Turn a saved task into a `TaskChange`. Views and the admin set
+    `changed_by` on the task to the user who saves it.
+    """
+    if raw:
+        return
+    tracker = instance.tracker
+    new = tracker.current()
+    if created:
+        old = None
+    else:
+        old = dict((field, tracker.previous(field)) for field in new)
+    tasks_changed.send(sender=Task,
+                       changes=[TaskChange(instance.pk, old, new)],
+                       user=getattr(instance, 'changed_by', None))
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    tracker = instance.tracker
+    old = dict((field, tracker.previous(field)) for field in tracker.fields)
+    tasks_changed.send(sender=Task,
+                       changes=[TaskChange(instance.pk, old, None)],
+                       user=getattr(instance, 'changed_by', None))
+
+
+@receiver(tasks_changed)
+def record_events(sender, changes, user=None, **kwargs):
+    from . import events
+    events.record_changes(changes, user)
+
+
+@receiver(tasks_changed)
+def update_task_stats(sender, changes, **kwargs):
+    TaskStats.apply_changes(changes)
+
+
+@receiver(tasks_changed)
+def update_status_counters(sender, changes, **kwargs):
+    from . import counters
+    counters.apply_changes(changes)
+
+
+@receiver(tasks_changed)
+def drop_workloads(sender, changes, **kwargs):
+    """
+    Drop the cached workloads of the users who gained or lost a task, or
+    whose task changed status or due date.
+    """
+    user_pks = set()
+    for change in changes:
+        if any(change.has_changed(field)
+               for field in ('status', 'assigned_user', 'due_date')):
+            user_pks.add(change.get_old('assigned_user'))
+            user_pks.add(change.get_new('assigned_user'))
+    user_pks.discard(None)
+    if user_pks:
+        from . import workload
+        workload.invalidate_workloads(user_pks)
+
+
+@receiver([post_save, post_delete, tasks_changed], sender=Task)
+def drop_facet_counts(sender, **kwargs):
+    """
+    Facets cover fields the tracker does not follow, so every write to a
+    task invalidates them.
+    """
+    from .facets import invalidate_facet_counts
+    invalidate_facet_counts()
+
+
+@receiver([post_save, post_delete], sender=comments.get_model())
+def update_comment_count(sender, instance, **kwargs):
+    """
+    Recount the visible comments of the task a comment belongs to. Counting
+    instead of adding one keeps moderation (hiding, removing) right too.
+    """
+    if instance.content_type_id != ContentType.objects.get_for_model(Task).pk:
+        return
+    count = sender.objects.filter(content_type=instance.content_type_id,
+                                  object_pk=instance.object_pk,
+                                  is_public=True,
+                                  is_removed=False).count()
+    if not Task.objects.filter(pk=instance.object_pk).update(
+                                                    comment_count=count):
+        if TaskArchive.objects.filter(pk=instance.object_pk).update(
+                                                    comment_count=count):
+            from . import archive
+            archive.invalidate_archive()
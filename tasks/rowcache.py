@@ -0,0 +1,65 @@
+"""
+An in-process cache for the rendered HTML of table rows.
+
+Every process keeps its own cache and its own hit and miss counts.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+ROW_CACHE_SIZE = getattr(settings, 'TASK_ROW_CACHE_SIZE', 2000)
+
+
+class LRUCache(object):
+    """
+    A thread safe mapping that holds at most `max_size` entries, evicting
+    the least recently used one when it is full.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.clear()
+
+    def get(self, key):
+        """
+        Return the value cached under key, or None.
+        """
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.entries[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': float(self.hits) / lookups if lookups else None,
+            }
+
+
+row_cache = LRUCache(ROW_CACHE_SIZE)
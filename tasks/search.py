@@ -0,0 +1,109 @@
+"""
+Full-text search over the title and description of tasks.
+
+On SQLite the text lives in an FTS5 table that triggers keep in sync with
+the task table, on PostgreSQL a GIN index over the tsvector expression is
+used directly. Other databases fall back to a plain `icontains` scan.
+"""
+import re
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import Q
+
+
+FTS_TABLE = 'tasks_task_fts'
+
+SQLITE_CREATE_FTS_TABLE = (
+    "CREATE VIRTUAL TABLE tasks_task_fts USING fts5("
+    "title, description, content='tasks_task', content_rowid='id')")
+
+SQLITE_REBUILD_FTS_TABLE = (
+    "INSERT INTO tasks_task_fts(tasks_task_fts) VALUES('rebuild')")
+
+SQLITE_TRIGGERS = (
+    ('tasks_task_fts_insert',
+     "CREATE TRIGGER tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN "
+     "INSERT INTO tasks_task_fts(rowid, title, description) "
+     "VALUES (new.id, new.title, new.description); END"),
+    ('tasks_task_fts_delete',
+     "CREATE TRIGGER tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN "
+     "INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description) "
+     "VALUES ('delete', old.id, old.title, old.description); END"),
+    ('tasks_task_fts_update',
+     "CREATE TRIGGER tasks_task_fts_update "
+     "AFTER UPDATE OF title, description ON tasks_task BEGIN "
+     "INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, description) "
+     "VALUES ('delete', old.id, old.title, old.description); "
+     "INSERT INTO tasks_task_fts(rowid, title, description) "
+     "VALUES (new.id, new.title, new.description); END"),
+)
+
+POSTGRES_DOCUMENT = ("to_tsvector('english', "
+                     "tasks_task.title || ' ' || tasks_task.description)")
+
+POSTGRES_CREATE_INDEX = (
+    "CREATE INDEX tasks_task_search ON tasks_task USING gin("
+    "(to_tsvector('english', title || ' ' || description)))")
+
+
+def create_sqlite_triggers(execute):
+    """
+    (Re)create the triggers that keep the FTS table in sync. South rebuilds
+    SQLite tables to alter them, which drops their triggers, so migrations
+    that alter the task table call this afterwards.
+    """
+    for name, sql in SQLITE_TRIGGERS:
+        execute('DROP TRIGGER IF EXISTS %s' % name)
+        execute(sql)
+
+
+def get_terms(query):
+    return re.findall(r'\w+', query, re.UNICODE)
+
+
+def search(queryset, query):
+    """
+    Narrow the queryset to the tasks matching every word of the query, best
+    matches first. The score is available as `search_rank`.
+    """
+    terms = get_terms(query)
+    if not terms:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # Quote every term so that user input is never parsed as FTS syntax.
+        match = ' '.join('"%s"' % term for term in terms)
+        queryset = queryset.extra(
+            tables=[FTS_TABLE],
+            where=['%s.rowid = tasks_task.id' % FTS_TABLE,
+                   '%s MATCH %%s' % FTS_TABLE],
+            params=[match],
+            # bm25() is lower for better matches.
+            select=OrderedDict([('search_rank', '-bm25(%s)' % FTS_TABLE)]))
+    elif vendor == 'postgresql':
+        tsquery = "plainto_tsquery('english', %s)"
+        queryset = queryset.extra(
+            where=['%s @@ %s' % (POSTGRES_DOCUMENT, tsquery)],
+            params=[' '.join(terms)],
+            select=OrderedDict([
+                ('search_rank',
+                 'ts_rank(%s, %s)' % (POSTGRES_DOCUMENT, tsquery))]),
+            select_params=[' '.join(terms)])
+    else:
+        return match_terms(queryset, query)
+    return queryset.order_by('-search_rank')
+
+
+def match_terms(queryset, query):
+    """
+    Narrow the queryset to the tasks whose title or description contains
+    every word of the query, without the help of an index.
+    """
+    terms = get_terms(query)
+    if not terms:
+        return queryset.none()
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) |
+                                   Q(description__icontains=term))
+    return queryset
@@ -0,0 +1,26 @@
+from collections import namedtuple
+
+from django.dispatch import Signal
+
+
+class TaskChange(namedtuple('TaskChange', 'pk old new')):
+    """
+    The tracked fields of a task before and after a change. `old` is None for
+    a created task and `new` is None for a deleted one. `pk` is None for
+    tasks created with `bulk_create`.
+    """
+    def get_old(self, field):
+        return self.old.get(field) if self.old else None
+
+    def get_new(self, field):
+        return self.new.get(field) if self.new else None
+
+    def has_changed(self, field):
+        return (self.old is None or self.new is None or
+                self.get_old(field) != self.get_new(field))
+
+
+# Sent with a list of `TaskChange` whenever tasks are created, edited or
+# deleted, whether one at a time or in bulk, and the `user` who made the
+# changes if they were made by one.
+tasks_changed = Signal(providing_args=['changes', 'user'])
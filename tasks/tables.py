@@ -1,9 +1,12 @@
+from django.utils.encoding import force_text
+from django.utils.html import conditional_escape, format_html
 from django.utils.safestring import mark_safe
 
 import django_tables2 as tables
 from django_tables2.utils import A
 
 from .models import Task
+from .rowcache import row_cache
 
 
 STATUS_SYMBOL_MAP = {
@@ -18,15 +21,32 @@ PRIORTY_BADGE_MAP = {
         Task.PRIORITY_CHOICES.high: 'alert-danger'
         }
 
+def is_overdue(task):
+    # The list views annotate the flag in SQL, where it is NULL for tasks
+    # without a due date. Fall back to the model for other data.
+    if hasattr(task, 'overdue'):
+        return bool(task.overdue)
+    return task.is_due()
+
+
 class TaskTable(tables.Table):
+    # Checkboxes posted as 'tasks' to the bulk transition view.
+    selection = tables.CheckBoxColumn(
+                    accessor='pk',
+                    attrs={'td__input': {'name': 'tasks'},
+                           'th__input': {'class': 'select-all-tasks'},
+                           'td': {'class': 'rowlink-skip'}})
     id = tables.LinkColumn('task_detail', args=[A('pk')])
+    comment_count = tables.Column(verbose_name='Activity')
     #created = tables.Column(visible=False)
 
     def render_due_date(self, value, record):
         """
         Render thumbs down symbol if the task crossed due date.
         """
-        if record.is_due():
+        if value is None:
+            return ''
+        if is_overdue(record):
             symbol = " <span class='glyphicon glyphicon-thumbs-down'></span>"
         else:
             symbol = ""
@@ -45,6 +65,14 @@ class TaskTable(tables.Table):
         badge = PRIORTY_BADGE_MAP.get(record.priority)
         return mark_safe("<span class='badge {}'>{}</span>".format(badge, value))
 
+    def render_comment_count(self, value):
+        """
+        Show the number of follow ups with a speech bubble.
+        """
+        return mark_safe(
+                "<span class='glyphicon glyphicon-comment'></span> {}".format(
+                    value))
+
     def render_status(self, value, record):
         """
         Show icons instead of show status display text.
@@ -55,9 +83,47 @@ class TaskTable(tables.Table):
         symbol_html = symbol_html.format(STATUS_SYMBOL_MAP[record.status])
         return mark_safe(symbol_html)
 
+    def get_row_cache_key(self, record):
+        """
+        Everything the cells of a task's row depend on. Renaming a user does
+        not change it, such rows stay stale until they are evicted.
+        """
+        return (self.__class__.__name__,
+                tuple(column.name for column in self.columns),
+                record.pk,
+                record.last_modified,
+                record.comment_count,
+                is_overdue(record))
+
+    def render_row_cells(self, row):
+        """
+        Return the <td> cells of the row, built only if the task changed
+        since its row was last rendered.
+        """
+        key = self.get_row_cache_key(row.record)
+        html = row_cache.get(key)
+        if html is None:
+            html = mark_safe(''.join(
+                        format_html('<td {0}>{1}</td>',
+                                    column.attrs['td'].as_html(),
+                                    conditional_escape(force_text(cell)))
+                        for column, cell in row.items()))
+            row_cache.set(key, html)
+        return html
+
     class Meta:
         model = Task
+        template = 'tasks/task_table.html'
         attrs = {'class': 'table table-condensed rowlink', }
-        fields = ('id', 'title', 'due_date', 'module', 'priority', 'assigned_user', 'type', 'status')
+        fields = ('selection', 'id', 'title', 'due_date', 'module', 'priority', 'assigned_user', 'type', 'status', 'comment_count')
         order_by = 'due_date'
         per_page = 15
+
+
+class SearchTaskTable(TaskTable):
+    # Lets the table order search results by relevance, which is what it
+    # does unless a column is picked to sort on.
+    search_rank = tables.Column(visible=False)
+
+    class Meta(TaskTable.Meta):
+        pass
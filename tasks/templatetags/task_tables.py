@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def render_row_cells(row):
+    """
+    Render the cells of a table row, from the table's row cache if it has
+    one.
+    """
+    return row.table.render_row_cells(row)
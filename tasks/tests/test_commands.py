@@ -0,0 +1,424 @@
+import asyncore
+import datetime
+import hashlib
+import hmac
+import http.server
+import json
+import os
+import shutil
+import smtpd
+import tempfile
+import threading
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from ..models import (Task, TaskArchive, TaskEvent, TaskStats,
+    WebhookDelivery, WebhookEndpoint)
+from ..notifications import Mailer, send_notifications
+from ..webhooks import Dispatcher, RateLimiter, send_webhooks
+
+
+class BenchmarkListViewsCommandTestCase(TestCase):
+    def test_benchmark_list_views(self):
+        """
+        Test that the benchmark seeds tasks and reports every list view.
+        """
+        out = StringIO()
+        call_command('benchmark_list_views', seed=20, repeat=1, stdout=out)
+        self.assertEqual(Task.objects.count(), 20)
+        output = out.getvalue()
+        for view_name in ('ListTasksView', 'ListIncompleteTasksView',
+                          'ListUnReviewedTasksView', 'ListCompletedTasksView'):
+            self.assertIn(view_name, output)
+        self.assertIn('median', output)
+
+
+class RebuildTaskStatsCommandTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='ragsagar',
+                                        password='password')
+        for module in ('CRM', 'CRM', 'HRMS'):
+            Task.objects.create(title='Test task',
+                                module=module,
+                                due_date=datetime.date(2014, 4, 2),
+                                created_by=user,
+                                assigned_user=user)
+
+    def test_check_and_rebuild(self):
+        """
+        Test that drift is reported by --check and fixed by a rebuild.
+        """
+        out = StringIO()
+        call_command('rebuild_task_stats', check=True, stdout=out)
+        self.assertIn('in sync', out.getvalue())
+
+        TaskStats.objects.filter(module='CRM').update(count=5)
+        self.assertRaises(CommandError, call_command, 'rebuild_task_stats',
+                          check=True, stdout=StringIO())
+
+        call_command('rebuild_task_stats', stdout=StringIO())
+        self.assertEqual(TaskStats.find_drift(), {})
+        self.assertEqual(
+            TaskStats.objects.get(status=Task.STATUS_CHOICES.incomplete,
+                                  module='CRM').count,
+            2)
+
+
+class ExportTasksCommandTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='ragsagar',
+                                        password='password')
+        for title in ('First task', 'Second task', 'Third task'):
+            Task.objects.create(title=title,
+                                due_date=datetime.date(2014, 4, 2),
+                                created_by=user,
+                                assigned_user=user)
+
+    def test_export_in_chunks(self):
+        """
+        Test that tasks read over several chunks are all exported once.
+        """
+        out = StringIO()
+        call_command('export_tasks', format='jsonl', chunk_size=2, stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['title'] for row in rows],
+                         ['First task', 'Second task', 'Third task'])
+        self.assertEqual(rows[0]['created_by'], 'ragsagar')
+
+        self.assertRaises(CommandError, call_command, 'export_tasks',
+                          status='unknown', stdout=StringIO())
+
+
+class ImportTasksCommandTestCase(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='ragsagar', password='password')
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as output:
+            output.write(content)
+        return path
+
+    def test_import_csv(self):
+        """
+        Test that valid rows are imported in batches and bad ones reported.
+        """
+        path = self.write_file('tasks.csv', (
+            'title,module,priority,status,due_date,assigned_user,created\n'
+            'First task,CRM,High,Complete,2014-04-02,ragsagar,'
+            '2014-03-01T10:00:00+00:00\n'
+            'Second task,CRM,1,,2014-04-02,,\n'
+            'Third task,HRMS,urgent,,2014-04-02,,\n'
+            'Fourth task,HRMS,,,2014-02-30,,\n'
+            'Fifth task,HRMS,,,2014-04-02,nobody,\n'
+            ',HRMS,,,2014-04-02,,\n'
+            'Sixth task,HRMS,,ready for review,2014-04-02,,\n'
+            'Seventh task,HRMS,,,,,\n'
+            'Eighth task,HRMS,,,2014-04-02,,yesterday\n'))
+        out, err = StringIO(), StringIO()
+        call_command('import_tasks', path, batch_size=2, stdout=out,
+                     stderr=err)
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list('title', flat=True)),
+            ['First task', 'Second task', 'Sixth task'])
+        first = Task.objects.get(title='First task')
+        self.assertEqual(first.priority, Task.PRIORITY_CHOICES.high)
+        self.assertEqual(first.status, Task.STATUS_CHOICES.complete)
+        self.assertEqual(first.assigned_user.username, 'ragsagar')
+        self.assertEqual(first.created,
+                         datetime.datetime(2014, 3, 1, 10, 0,
+                                           tzinfo=timezone.utc))
+        self.assertIn('Imported 3 tasks, rejected 6 rows', out.getvalue())
+        self.assertIn("Line 4 rejected: Unknown priority 'urgent'.",
+                      err.getvalue())
+        self.assertIn("Line 9 rejected: Due date is missing.",
+                      err.getvalue())
+        self.assertIn("Line 10 rejected: Invalid created 'yesterday'.",
+                      err.getvalue())
+        self.assertEqual(TaskStats.find_drift(), {})
+
+        self.assertRaises(CommandError, call_command, 'import_tasks',
+                          self.write_file('tasks.txt', ''),
+                          stdout=StringIO())
+
+    def test_import_malformed_jsonl(self):
+        """
+        Test that lines that are not JSON objects are reported and skipped
+        instead of stopping the import.
+        """
+        path = self.write_file('tasks.jsonl', (
+            '{"title": "First task", "due_date": "2014-04-02"}\n'
+            '{"title": "Broken\n'
+            '\n'
+            '["Not", "an", "object"]\n'
+            '{"title": "Second task", "due_date": "2014-04-02"}\n'))
+        out, err = StringIO(), StringIO()
+        call_command('import_tasks', path, batch_size=1, stdout=out,
+                     stderr=err)
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list('title', flat=True)),
+            ['First task', 'Second task'])
+        self.assertIn('Line 2 rejected: Malformed JSON', err.getvalue())
+        self.assertIn('Line 4 rejected: Not a JSON object.', err.getvalue())
+
+
+class ArchiveTasksCommandTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='ragsagar',
+                                        password='password')
+        for title, status in (('Old task', Task.STATUS_CHOICES.complete),
+                              ('Older task', Task.STATUS_CHOICES.complete),
+                              ('Open task', Task.STATUS_CHOICES.incomplete),
+                              ('Recent task', Task.STATUS_CHOICES.complete)):
+            Task.objects.create(title=title,
+                                status=status,
+                                module='CRM',
+                                due_date=datetime.date(2014, 4, 2),
+                                created_by=user,
+                                assigned_user=user)
+        Task.objects.exclude(title='Recent task').update(
+            last_modified=datetime.datetime(2014, 4, 2, 12, 0))
+
+    def test_archive_in_batches(self):
+        """
+        Test that old completed tasks are moved as they are and that the
+        stats still count them.
+        """
+        old_task = Task.objects.get(title='Old task')
+        out = StringIO()
+        call_command('archive_tasks', days=30, batch_size=1, stdout=out)
+        self.assertEqual(
+            sorted(Task.objects.values_list('title', flat=True)),
+            ['Open task', 'Recent task'])
+        self.assertEqual(
+            sorted(TaskArchive.objects.values_list('title', flat=True)),
+            ['Old task', 'Older task'])
+        archived = TaskArchive.objects.get(pk=old_task.pk)
+        self.assertEqual(archived.created, old_task.created)
+        self.assertEqual(archived.last_modified, old_task.last_modified)
+        self.assertEqual(archived.assigned_user_id, old_task.assigned_user_id)
+        self.assertIn('Archived 2 tasks in total.', out.getvalue())
+        self.assertEqual(TaskStats.find_drift(), {})
+        self.assertEqual(
+            TaskStats.objects.get(status=Task.STATUS_CHOICES.complete,
+                                  module='CRM').count,
+            3)
+
+        # The newest task holds the ids of the archived ones.
+        call_command('archive_tasks', days=0, stdout=StringIO())
+        self.assertEqual(
+            sorted(Task.objects.values_list('title', flat=True)),
+            ['Open task', 'Recent task'])
+
+
+class SMTPStandIn(smtpd.SMTPServer):
+    """
+    A local SMTP server that keeps the messages it receives, after turning
+    away the first `failures` of them.
+    """
+    def __init__(self, failures=0):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.failures = failures
+        self.messages = []
+        self.thread = threading.Thread(target=asyncore.loop,
+                                       kwargs={'timeout': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            return '451 Try again later'
+        self.messages.append((rcpttos, data))
+
+    def stop(self):
+        self.close()
+        self.thread.join(1)
+
+
+class SendNotificationsCommandTestCase(TestCase):
+    def setUp(self):
+        self.reviewer = User.objects.create_user(
+            username='reviewer', email='reviewer@example.com',
+            password='password')
+        self.reviewer.is_staff = True
+        self.reviewer.save()
+        self.user = User.objects.create_user(
+            username='ragsagar', email='ragsagar@example.com',
+            password='password')
+        self.smtp = SMTPStandIn(failures=1)
+        self.addCleanup(self.smtp.stop)
+
+    def test_send_digests(self):
+        """
+        Test that the changes since the last run are sent as one digest per
+        recipient, retrying the message the server turned away.
+        """
+        call_command('send_notifications', stdout=StringIO())
+        task = Task.objects.create(title='Test task',
+                                   due_date=datetime.date(2014, 4, 2),
+                                   assigned_user=self.user)
+        Task.objects.transition(task.pk, 'ready', self.user)
+        Task.objects.create(title='Other task',
+                            due_date=datetime.date(2014, 4, 2),
+                            assigned_user=self.user)
+        TaskEvent.objects.update(
+            created=timezone.now() - datetime.timedelta(seconds=5))
+        with override_settings(
+                TASK_NOTIFICATION_EMAIL_BACKEND=(
+                    'django.core.mail.backends.smtp.EmailBackend'),
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=self.smtp.port):
+            mailer = Mailer(sleep=lambda seconds: None)
+            self.assertEqual(send_notifications(mailer), 3)
+            mailer.close()
+        digests = dict((rcpttos[0], data)
+                       for rcpttos, data in self.smtp.messages)
+        self.assertEqual(sorted(digests),
+                         ['ragsagar@example.com', 'reviewer@example.com'])
+        self.assertIn('2 task update(s)', digests['ragsagar@example.com'])
+        self.assertIn('Other task was assigned to you',
+                      digests['ragsagar@example.com'])
+        self.assertIn('Test task is ready for review',
+                      digests['reviewer@example.com'])
+        self.assertNotIn('ready for review', digests['ragsagar@example.com'])
+
+
+class HTTPStandInHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, self.headers, body))
+        statuses = self.server.statuses.get(self.path)
+        self.send_response(statuses.pop(0) if statuses else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HTTPStandIn(http.server.HTTPServer):
+    """
+    A local HTTP server that keeps the requests it receives and answers
+    them with the statuses queued for their path, or 200 once there are
+    none left.
+    """
+    def __init__(self, statuses=None):
+        http.server.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                        HTTPStandInHandler)
+        self.statuses = statuses or {}
+        self.requests = []
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+
+    def url(self, path):
+        return 'http://127.0.0.1:%d%s' % (self.server_port, path)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join(1)
+
+
+class SendWebhooksCommandTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ragsagar',
+                                             password='password')
+        self.server = HTTPStandIn({'/flaky': [500], '/gone': [410] * 4})
+        self.addCleanup(self.server.stop)
+        self.flaky = WebhookEndpoint.objects.create(
+            url=self.server.url('/flaky'), secret='flaky secret')
+        self.gone = WebhookEndpoint.objects.create(
+            url=self.server.url('/gone'), secret='gone secret')
+
+    def test_send_webhooks(self):
+        """
+        Test that creations and transitions are posted to every endpoint,
+        signed, retried when they fail and dead after the last attempt.
+        """
+        call_command('send_webhooks', stdout=StringIO())
+        task = Task.objects.create(title='Test task',
+                                   due_date=datetime.date(2014, 4, 2),
+                                   created_by=self.user,
+                                   assigned_user=self.user)
+        Task.objects.transition(task.pk, 'ready', self.user)
+        TaskEvent.objects.update(
+            created=timezone.now() - datetime.timedelta(seconds=5))
+        dispatcher = Dispatcher(attempts=2, backoff=0)
+        self.addCleanup(dispatcher.close)
+        self.assertEqual(send_webhooks(dispatcher), 4)
+        self.assertEqual(send_webhooks(dispatcher), 3)
+        self.assertEqual(send_webhooks(dispatcher), 0)
+
+        statuses = WebhookDelivery.STATUS_CHOICES
+        self.assertEqual(
+            sorted(self.flaky.deliveries.values_list('status', flat=True)),
+            [statuses.delivered, statuses.delivered])
+        dead = self.gone.deliveries.filter(status=statuses.dead)
+        self.assertEqual(dead.count(), 2)
+        self.assertIn('410', dead[0].last_error)
+
+        payloads = {}
+        for path, headers, body in self.server.requests:
+            if path != '/flaky':
+                continue
+            digest = hmac.new(b'flaky secret', body, hashlib.sha256)
+            self.assertEqual(headers['X-Task-Signature'],
+                             'sha256=' + digest.hexdigest())
+            payload = json.loads(body.decode('utf-8'))
+            payloads[payload['event']] = payload
+        self.assertEqual(sorted(payloads),
+                         ['task.created', 'task.transitioned'])
+        transition = payloads['task.transitioned']['task']
+        self.assertEqual(transition['title'], 'Test task')
+        self.assertEqual(transition['old_status'], 'Incomplete')
+        self.assertEqual(transition['status'], 'Ready for Review')
+
+    def test_throttled_endpoint(self):
+        """
+        Test that a throttled endpoint's backlog does not hold up the other
+        endpoints and waits for the limit.
+        """
+        now = timezone.now()
+        self.gone.rate_limit = 1
+        self.gone.save()
+        for event_id in range(1, 5):
+            WebhookDelivery.objects.create(
+                endpoint=self.gone, event_id=event_id, payload='{}',
+                next_attempt_at=now - datetime.timedelta(minutes=1))
+        WebhookDelivery.objects.create(endpoint=self.flaky, event_id=1,
+                                       payload='{}', next_attempt_at=now)
+        dispatcher = Dispatcher(clock=lambda: 0.0)
+        claimed = dispatcher.claim(batch_size=2)
+        self.assertEqual([(d.endpoint, d.event_id) for d in claimed],
+                         [(self.gone, 1), (self.flaky, 1)])
+        throttled = self.gone.deliveries.exclude(event_id=1)
+        self.assertEqual(throttled.filter(next_attempt_at__lte=now).count(),
+                         0)
+        self.assertEqual(dispatcher.claim(batch_size=2), [])
+
+    def test_rate_limit(self):
+        """
+        Test that an endpoint gets bursts of up to its rate limit and then
+        one delivery per 1 / rate seconds.
+        """
+        now = [0.0]
+        limiter = RateLimiter(2, clock=lambda: now[0])
+        self.assertEqual([limiter.try_acquire() for i in range(3)],
+                         [True, True, False])
+        now[0] += 0.5
+        self.assertEqual([limiter.try_acquire() for i in range(2)],
+                         [True, False])
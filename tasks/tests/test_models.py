@@ -1,14 +1,19 @@
 import datetime
 
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User
 
-from ..models import Task
+from ..counters import get_status_count, get_status_counts
+from ..events import consume
+from ..models import Task, TaskEvent, TaskStats
 
 
 class TaskModelTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = self.create_user()
         #self.client.login(username='ragsagar', password='password')
         #self.task = self.create_task()
@@ -76,4 +81,104 @@ class TaskModelTestCase(TestCase):
         self.assertEqual(completed_task.is_due(), False)
         self.assertEqual(due_task.is_due(), True)
         self.assertEqual(incomplete_task.is_due(), False)
+        incomplete_task.due_date = None
+        self.assertEqual(incomplete_task.is_due(), False)
+        self.assertEqual(incomplete_task.is_due_today(), False)
+
+    @override_settings(TASK_SHARED_CACHE=True)
+    def test_status_counters(self):
+        """
+        Test that the cached status counters follow status changes.
+        """
+        task = self.create_task()
+        self.create_task(status=Task.STATUS_CHOICES.ready_for_review)
+        self.assertEqual(get_status_counts(), {
+            Task.STATUS_CHOICES.incomplete: 1,
+            Task.STATUS_CHOICES.ready_for_review: 1,
+            Task.STATUS_CHOICES.complete: 0,
+        })
+        task.status = Task.STATUS_CHOICES.ready_for_review
+        task.save()
+        self.create_task(status=Task.STATUS_CHOICES.complete)
+        with self.assertNumQueries(0):
+            unreviewed_count = get_status_count(
+                                    Task.STATUS_CHOICES.ready_for_review)
+            incomplete_count = get_status_count(
+                                    Task.STATUS_CHOICES.incomplete)
+            complete_count = get_status_count(Task.STATUS_CHOICES.complete)
+        self.assertEqual(unreviewed_count, 2)
+        self.assertEqual(incomplete_count, 0)
+        self.assertEqual(complete_count, 1)
+        task.delete()
+        self.assertEqual(
+            get_status_count(Task.STATUS_CHOICES.ready_for_review), 1)
+
+    @override_settings(TASK_SHARED_CACHE=False)
+    def test_status_counts_without_shared_cache(self):
+        """
+        Test that the status counts are read from the stats table when the
+        cache is not shared between processes.
+        """
+        task = self.create_task(status=Task.STATUS_CHOICES.ready_for_review)
+        self.assertEqual(
+            get_status_count(Task.STATUS_CHOICES.ready_for_review), 1)
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.STATUS_CHOICES.complete)
+        TaskStats.objects.filter(status=Task.STATUS_CHOICES.ready_for_review
+                                 ).update(count=0)
+        self.assertEqual(
+            get_status_count(Task.STATUS_CHOICES.ready_for_review), 0)
+
+    def test_task_stats_deltas(self):
+        """
+        Test that the stats table follows creation, edits and deletion.
+        """
+        def stats():
+            return dict(((row.status, row.module), row.count)
+                        for row in TaskStats.objects.filter(count__gt=0))
+        task = self.create_task()
+        self.create_task()
+        incomplete = Task.STATUS_CHOICES.incomplete
+        complete = Task.STATUS_CHOICES.complete
+        self.assertEqual(stats(), {(incomplete, 'CRM'): 2})
+        task.module = 'HRMS'
+        task.status = complete
+        task.save()
+        self.assertEqual(stats(), {(incomplete, 'CRM'): 1,
+                                   (complete, 'HRMS'): 1})
+        task.delete()
+        self.assertEqual(stats(), {(incomplete, 'CRM'): 1})
+        self.assertEqual(TaskStats.find_drift(), {})
+
+    def test_event_log(self):
+        """
+        Test that every change is appended to the event log with the user
+        who made it, and that consumers only see events once.
+        """
+        task = self.create_task()
+        task.changed_by = self.user
+        task.title = 'Renamed task'
+        task.save()
+        Task.objects.transition(task.pk, 'ready', self.user)
+        Task.objects.filter(pk=task.pk).apply_transition('complete')
+        kinds = TaskEvent.KIND_CHOICES
+        events = list(TaskEvent.objects.filter(task_id=task.pk))
+        self.assertEqual([event.kind for event in events],
+                         [kinds.created, kinds.edited, kinds.transitioned,
+                          kinds.transitioned])
+        self.assertEqual([event.user_id for event in events],
+                         [None, self.user.pk, self.user.pk, None])
+        self.assertEqual((events[2].old_status, events[2].status),
+                         (Task.STATUS_CHOICES.incomplete,
+                          Task.STATUS_CHOICES.ready_for_review))
+        self.assertEqual(events[0].module, 'CRM')
+        self.assertIsNone(events[0].old_module)
 
+        seen = []
+        self.assertEqual(consume('test', seen.extend, batch_size=3,
+                                 settle=-1), 4)
+        self.assertEqual(seen, events)
+        task.delete()
+        self.assertEqual(consume('test', seen.extend, settle=-1), 1)
+        self.assertEqual(seen[-1].kind, kinds.deleted)
+        self.assertEqual(consume('test', seen.extend, settle=-1), 0)
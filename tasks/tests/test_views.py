@@ -1,17 +1,51 @@
+import csv
 import datetime
+import io
 import json
 
 from django.db.models import Count
 
 from django.test import TestCase
+from django.utils import timezone
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.comments.models import Comment
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Task
+from ..archive import archive_tasks
+from ..changes import set_change_source
+from ..models import Task, TaskArchive, TaskEvent, local_today
+from ..rowcache import row_cache
+from ..workload import count_workloads
+
+
+class ChangeSourceStandIn(object):
+    """
+    A change source that numbers the lists of task primary keys appended
+    to `changes`.
+    """
+    def __init__(self):
+        self.changes = []
+
+    def publish(self, last_id):
+        pass
+
+    def get_last_id(self):
+        return len(self.changes)
+
+    def get_changes(self, since):
+        if since is None:
+            return len(self.changes), []
+        return len(self.changes), sorted(set(
+            pk for pks in self.changes[since:] for pk in pks))
 
 
 class TaskTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = self.create_user()
         self.client.login(username='ragsagar', password='password')
         self.task = self.create_task()
@@ -113,6 +147,143 @@ class TaskTestCase(TestCase):
         self.assertNotIn(str(self.task.get_absolute_url()),
                          response.rendered_content)
 
+    def test_list_completed_tasks_cursor_pagination(self):
+        """
+        Test paging through completed tasks with next/previous cursors.
+        """
+        for i in range(20):
+            self.create_task(title="Completed Task %d" % i,
+                             status=Task.STATUS_CHOICES.complete)
+        completed_tasks = Task.objects.filter(
+            status=Task.STATUS_CHOICES.complete).order_by('-created', '-pk')
+        url = reverse('list_completed_tasks')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        first_page = response.context_data['cursor_page']
+        self.assertEqual(list(first_page), list(completed_tasks[:15]))
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        response = self.client.get(url, {'cursor': first_page.next_cursor})
+        second_page = response.context_data['cursor_page']
+        self.assertEqual(list(second_page), list(completed_tasks[15:]))
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+
+        response = self.client.get(url,
+                                   {'cursor': second_page.previous_cursor})
+        self.assertEqual(list(response.context_data['cursor_page']),
+                         list(first_page))
+
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_archived_tasks_read_through(self):
+        """
+        Test that archived tasks are still shown by the completed list, the
+        detail page, the API, the export and the search.
+        """
+        completed = Task.objects.get(title='Completed Task')
+        recent = self.create_task(title="Recent Task",
+                                  status=Task.STATUS_CHOICES.complete)
+        Task.objects.filter(pk=recent.pk).update(
+            created=timezone.now() + datetime.timedelta(days=1))
+        Task.objects.filter(pk=completed.pk).update(
+            last_modified=timezone.now() - datetime.timedelta(days=2))
+        archive_tasks(timezone.now() - datetime.timedelta(days=1))
+        self.assertFalse(Task.objects.filter(pk=completed.pk).exists())
+        self.assertEqual(list(TaskArchive.objects.values_list('pk', flat=True)),
+                         [completed.pk])
+
+        response = self.client.get(reverse('list_completed_tasks'))
+        self.assertEqual([task.pk for task in
+                          response.context_data['cursor_page']],
+                         [recent.pk, completed.pk])
+
+        response = self.client.get(str(completed.get_absolute_url()))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context_data['task'].is_archived)
+        self.assertContains(response, 'Archived')
+        self.assertNotContains(response,
+                               reverse('edit_task', kwargs={'pk': completed.pk}))
+
+        response = self.client.get(reverse('task_comments',
+                                           kwargs={'pk': completed.pk}))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(reverse('api_task_detail',
+                                           kwargs={'pk': completed.pk}))
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['title'], 'Completed Task')
+
+        response = self.client.get(reverse('api_task_list'),
+                                   {'status': 'complete', 'fields': 'id'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([row['id'] for row in data['results']],
+                         [recent.pk, completed.pk])
+
+        response = self.client.get(reverse('export_tasks'),
+                                   {'format': 'jsonl', 'status': 'complete'})
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn(completed.pk, [json.loads(line)['id']
+                                     for line in content.splitlines()])
+
+        response = self.client.get(reverse('search_tasks'),
+                                   {'q': 'Completed'})
+        self.assertEqual(list(response.context_data['archived_matches']),
+                         [TaskArchive.objects.get(pk=completed.pk)])
+
+    def test_unreviewed_task_count_context(self):
+        """
+        Test the navbar count of unreviewed tasks follows status changes.
+        """
+        response = self.client.get(reverse('list_tasks'))
+        self.assertEqual(response.context['unreviewed_task_count'], 1)
+        self.client.post(reverse('set_task_ready',
+                                 kwargs={'pk': self.task.pk}))
+        response = self.client.get(reverse('list_tasks'))
+        self.assertEqual(response.context['unreviewed_task_count'], 2)
+
+    def test_list_overdue_and_due_today_tasks_views(self):
+        """
+        Test the views of overdue tasks and of tasks due today.
+        """
+        due_today_task = self.create_task(title="Due today task")
+        due_today_task.due_date = local_today()
+        due_today_task.save()
+        response = self.client.get(reverse('list_overdue_tasks'))
+        self.assertEqual(response.status_code, 200)
+        tasks = response.context_data['task_list']
+        self.assertEqual(
+            set(tasks),
+            set(Task.objects.filter(status__in=Task.OPEN_STATUSES,
+                                    due_date__lt=local_today())))
+        self.assertNotIn(due_today_task, tasks)
+        self.assertTrue(all(task.overdue for task in tasks))
+        self.assertIn('glyphicon-thumbs-down', response.rendered_content)
+
+        response = self.client.get(reverse('list_due_today_tasks'))
+        self.assertEqual(response.status_code, 200)
+        tasks = list(response.context_data['task_list'])
+        self.assertEqual(tasks, [due_today_task])
+        self.assertTrue(tasks[0].due_today)
+        self.assertFalse(tasks[0].overdue)
+
+    def test_task_without_due_date(self):
+        """
+        Test that tasks without a due date, e.g. from before due dates were
+        added, are listed and shown as not overdue.
+        """
+        task = self.create_task(title="Undated task")
+        Task.objects.filter(pk=task.pk).update(due_date=None)
+        response = self.client.get(reverse('list_tasks'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Undated task')
+        response = self.client.get(reverse('task_detail',
+                                           kwargs={'pk': task.pk}))
+        self.assertEqual(response.status_code, 200)
+
     def test_detail_task_view(self):
         """
         Test detail task view page.
@@ -123,6 +294,38 @@ class TaskTestCase(TestCase):
         self.assertEqual(response.context_data['task'], self.task)
         self.assertTemplateUsed(response, 'tasks/task_detail.html')
 
+    def test_detail_task_view_query_budget(self):
+        """
+        Test that the detail page costs the same number of queries with one
+        comment as with many.
+        """
+        reviewer = self.create_user(username='reviewer')
+        Task.objects.filter(pk=self.task.pk).update(reviewed_by=reviewer)
+        detail_url = reverse('task_detail', kwargs={'pk': self.task.pk})
+
+        def add_comments(count):
+            start = Comment.objects.count()
+            for i in range(start, start + count):
+                user = self.create_user(username='commenter%d' % i)
+                Comment.objects.create(content_object=self.task,
+                                       user=user,
+                                       comment='Follow up %d' % i,
+                                       site_id=settings.SITE_ID)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(detail_url)
+            self.assertEqual(response.status_code, 200)
+            return len(queries.captured_queries)
+
+        add_comments(1)
+        # Warm up the caches the first request fills.
+        self.client.get(detail_url)
+        one_comment = count_queries()
+        add_comments(30)
+        self.assertEqual(count_queries(), one_comment)
+        self.assertLessEqual(one_comment, 8)
+
     def test_create_task_view(self):
         """
         Test view to create new task.
@@ -200,6 +403,83 @@ class TaskTestCase(TestCase):
         self.assertEqual(task.status, Task.STATUS_CHOICES.complete)
 
 
+    def test_transition_conflicts(self):
+        """
+        Test that transitions on stale or changed tasks are refused.
+        """
+        url = reverse('set_task_incomplete', kwargs={'pk': self.task.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 409)
+
+        stale = self.task.last_modified
+        Task.objects.transition(self.task.pk, 'ready')
+        url = reverse('set_task_incomplete', kwargs={'pk': self.task.pk})
+        response = self.client.post(url,
+                                    {'last_modified': stale.isoformat()})
+        self.assertEqual(response.status_code, 409)
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual(task.status, Task.STATUS_CHOICES.ready_for_review)
+
+        response = self.client.post(
+                    url, {'last_modified': task.last_modified.isoformat()})
+        self.assertEqual(response.status_code, 302)
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual(task.status, Task.STATUS_CHOICES.incomplete)
+
+        url = reverse('set_task_ready', kwargs={'pk': 9999})
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+    def test_reopen_completed_task(self):
+        """
+        Test that a completed task can be set back to incomplete.
+        """
+        task = Task.objects.get(status=Task.STATUS_CHOICES.complete)
+        url = reverse('set_task_incomplete', kwargs={'pk': task.pk})
+        self.assertEqual(self.client.post(url).status_code, 302)
+        self.assertEqual(Task.objects.get(pk=task.pk).status,
+                         Task.STATUS_CHOICES.incomplete)
+
+    def test_bulk_transition_view(self):
+        """
+        Test applying a transition to many tasks at once.
+        """
+        other_task = self.create_task(title="Other task")
+        unreviewed_task = Task.objects.get(
+                            status=Task.STATUS_CHOICES.ready_for_review)
+        url = reverse('bulk_transition')
+        data = {
+            'transition': 'ready',
+            'tasks': [self.task.pk, other_task.pk, unreviewed_task.pk, 9999],
+        }
+        response = self.client.post(url, data,
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+        result = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(result['succeeded'],
+                         sorted([self.task.pk, other_task.pk]))
+        self.assertEqual(sorted(result['failed']),
+                         sorted([str(unreviewed_task.pk), '9999']))
+        for task in Task.objects.filter(pk__in=result['succeeded']):
+            self.assertEqual(task.status,
+                             Task.STATUS_CHOICES.ready_for_review)
+            self.assertIsNotNone(task.completed_at)
+
+        # Completing is for staff only.
+        data = {'transition': 'complete', 'tasks': [self.task.pk],
+                'next': reverse('list_unreviewed_tasks')}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 403)
+        staff_user = self.create_user(username='staff_user',
+                                      password='password')
+        staff_user.is_staff = True
+        staff_user.save()
+        self.client.login(username='staff_user', password='password')
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse('list_unreviewed_tasks'))
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual(task.status, Task.STATUS_CHOICES.complete)
+        self.assertEqual(task.reviewed_by, staff_user)
+
     def test_report_home_view(self):
         """
         Test the report home view
@@ -241,3 +521,497 @@ class TaskTestCase(TestCase):
         self.assertEqual(data.get('task_by_status'), tasks_by_status)
         self.assertEqual(data.get('task_by_module'), tasks_by_module)
         
+
+    def test_report_views_share_status_counts(self):
+        """
+        Test that the report page and its json call count statuses once.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('report_home'))
+            self.client.get(reverse('task_by_status_json'))
+        status_aggregates = [
+            query for query in queries.captured_queries
+            if 'GROUP BY' in query['sql'] and
+               '"tasks_task"."status"' in query['sql']]
+        self.assertLessEqual(len(status_aggregates), 1)
+
+    def test_search_tasks_view(self):
+        """
+        Test that search finds tasks by title and description, best match
+        first, and follows edits of the task.
+        """
+        url = reverse('search_tasks')
+        invoice = self.create_task(title="Invoice totals",
+                                   status=Task.STATUS_CHOICES.complete)
+        Task.objects.filter(pk=self.task.pk).update(
+            description='the invoice pdf is missing')
+        response = self.client.get(url, {'q': 'invoice'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [task.pk for task in response.context_data['table'].data],
+            [invoice.pk, self.task.pk])
+
+        response = self.client.get(url, {'q': 'invoice totals'})
+        self.assertEqual(list(response.context_data['task_list']), [invoice])
+
+        invoice.title = 'Quarterly summary'
+        invoice.save()
+        response = self.client.get(url, {'q': 'totals'})
+        self.assertEqual(list(response.context_data['task_list']), [])
+
+        response = self.client.get(url, {'q': '"*'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context_data['task_list']), [])
+
+    def test_list_tasks_view_search(self):
+        """
+        Test that the q parameter narrows the list views.
+        """
+        self.create_task(title="Invoice totals",
+                         status=Task.STATUS_CHOICES.complete)
+        response = self.client.get(reverse('list_tasks'), {'q': 'invoice'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context_data['task_list']), [])
+        response = self.client.get(reverse('list_completed_tasks'),
+                                   {'q': 'invoice'})
+        self.assertEqual(len(response.context_data['table'].rows), 1)
+
+    def test_list_tasks_view_facets(self):
+        """
+        Test that the facet parameters narrow the list and that the facet
+        counts come from one cached grouped query.
+        """
+        task = self.create_task(title="HRMS task", priority=3)
+        task.module = 'HRMS'
+        task.save()
+        url = reverse('list_tasks')
+        response = self.client.get(url, {'module': 'HRMS'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task.title for task in
+                          response.context_data['task_list']],
+                         ['HRMS task'])
+        facets = dict((facet['name'], facet)
+                      for facet in response.context_data['facets'])
+        self.assertEqual(
+            [(value['value'], value['count'], value['selected'])
+             for value in facets['module']['values']],
+            [('CRM', 2, False), ('HRMS', 1, True)])
+        self.assertEqual(
+            [(value['label'], value['count'])
+             for value in facets['priority']['values']],
+            [('High', 1)])
+
+        response = self.client.get(url, {'priority': '9',
+                                          'due_after': 'someday'})
+        self.assertEqual(len(response.context_data['task_list']), 3)
+        response = self.client.get(url, {'due_before': '2014-04-01'})
+        self.assertEqual(len(response.context_data['task_list']), 0)
+
+        def count_facet_queries():
+            return len([query for query in queries.captured_queries
+                        if 'GROUP BY' in query['sql'] and
+                           '"tasks_task"."priority"' in query['sql']])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'module': 'HRMS'})
+        self.assertEqual(count_facet_queries(), 0)
+        self.task.title = 'Renamed'
+        self.task.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'module': 'HRMS'})
+            self.client.get(url, {'module': 'HRMS'})
+        self.assertEqual(count_facet_queries(), 1)
+
+    def test_export_tasks_view(self):
+        """
+        Test that the export streams the tasks with their users' names.
+        """
+        url = reverse('export_tasks')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['id'] for row in rows],
+                         [str(pk) for pk in
+                          Task.objects.order_by('pk').values_list('pk',
+                                                                  flat=True)])
+        self.assertEqual(rows[0]['assigned_user'], 'ragsagar')
+        self.assertEqual(rows[0]['status'], 'Incomplete')
+        self.assertEqual(rows[0]['reviewed_by'], '')
+
+        response = self.client.get(url, {'format': 'jsonl',
+                                         'status': 'complete'})
+        content = b''.join(response.streaming_content).decode('utf-8')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Completed Task'])
+        self.assertEqual(rows[0]['due_date'], '2014-04-02')
+
+        response = self.client.get(url, {'status': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_task_list_api_view(self):
+        """
+        Test that the api pages through sparse task rows with one query.
+        """
+        url = reverse('api_task_list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,title,status',
+                                             'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        task_queries = [query for query in queries.captured_queries
+                        if '"tasks_task"' in query['sql']]
+        self.assertEqual(len(task_queries), 1)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(sorted(data['results'][0]),
+                         ['id', 'status', 'title'])
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNone(data['previous'])
+
+        response = self.client.get(url, {'fields': 'id,title',
+                                         'limit': 2,
+                                         'cursor': data['next']})
+        next_page = json.loads(response.content.decode('utf-8'))
+        ids = ([row['id'] for row in data['results']] +
+               [row['id'] for row in next_page['results']])
+        self.assertEqual(sorted(ids),
+                         sorted(Task.objects.values_list('pk', flat=True)))
+        self.assertIsNone(next_page['next'])
+
+        response = self.client.get(url, {'status': 'complete'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([row['title'] for row in data['results']],
+                         ['Completed Task'])
+        self.assertEqual(data['results'][0]['assigned_user'], 'ragsagar')
+
+        self.assertEqual(
+            self.client.get(url, {'fields': 'password'}).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {'cursor': 'garbage'}).status_code, 400)
+
+    def test_task_detail_api_view(self):
+        """
+        Test that the api returns a single task or a 404.
+        """
+        url = reverse('api_task_detail', kwargs={'pk': self.task.pk})
+        response = self.client.get(url, {'fields': 'title,due_date'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         {'title': 'Test task', 'due_date': '2014-04-02'})
+        url = reverse('api_task_detail', kwargs={'pk': 0})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_task_comments_view(self):
+        """
+        Test that the newest comments are shown with the task and older ones
+        are paged in from the comments view.
+        """
+        for i in range(25):
+            Comment.objects.create(
+                content_object=self.task,
+                user=self.user,
+                comment='Follow up %d' % i,
+                submit_date=timezone.now() - datetime.timedelta(minutes=25 - i),
+                site_id=settings.SITE_ID)
+        response = self.client.get(reverse('task_detail',
+                                           kwargs={'pk': self.task.pk}))
+        comment_page = response.context_data['comment_page']
+        self.assertEqual([comment.comment for comment in comment_page][0],
+                         'Follow up 24')
+        self.assertEqual(len(comment_page), 20)
+        self.assertContains(response, 'load-older-comments')
+
+        url = reverse('task_comments', kwargs={'pk': self.task.pk})
+        response = self.client.get(url, {'cursor': comment_page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([comment.comment for comment in
+                          response.context['comment_page']],
+                         ['Follow up %d' % i for i in range(4, -1, -1)])
+        self.assertNotContains(response, 'load-older-comments')
+        self.assertEqual(self.client.get(url, {'cursor': 'x'}).status_code,
+                         400)
+
+    def test_comment_count(self):
+        """
+        Test that the comment count of a task follows its visible comments.
+        """
+        comment = Comment.objects.create(content_object=self.task,
+                                         user=self.user,
+                                         comment='Follow up',
+                                         site_id=settings.SITE_ID)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).comment_count, 1)
+        comment.is_removed = True
+        comment.save()
+        self.assertEqual(Task.objects.get(pk=self.task.pk).comment_count, 0)
+        comment.is_removed = False
+        comment.save()
+        comment.delete()
+        self.assertEqual(Task.objects.get(pk=self.task.pk).comment_count, 0)
+
+    def test_conditional_get(self):
+        """
+        Test that unchanged pages are answered with a 304 and changed ones
+        are rendered again.
+        """
+        detail_url = reverse('task_detail', kwargs={'pk': self.task.pk})
+        urls = (detail_url, reverse('list_tasks'), reverse('report_home'),
+                reverse('task_by_status_json'))
+        etags = {}
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etags[url] = response['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse(response.content)
+        # Only the ETag tells the days apart.
+        self.assertFalse(self.client.get(detail_url).has_header(
+                                                        'Last-Modified'))
+
+        Comment.objects.create(content_object=self.task,
+                               user=self.user,
+                               comment='Follow up',
+                               site_id=settings.SITE_ID)
+        response = self.client.get(detail_url,
+                                   HTTP_IF_NONE_MATCH=etags[detail_url])
+        self.assertEqual(response.status_code, 200)
+
+        Task.objects.transition(self.task.pk, 'ready')
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200)
+
+    def test_task_table_row_cache(self):
+        """
+        Test that rows are rendered once until their task changes, and that
+        staff can see the cache statistics.
+        """
+        row_cache.clear()
+        url = reverse('list_tasks')
+        first = self.client.get(url)
+        self.assertEqual(row_cache.stats()['misses'], 2)
+        self.assertEqual(row_cache.stats()['hits'], 0)
+        second = self.client.get(url)
+        self.assertEqual(row_cache.stats()['hits'], 2)
+        self.assertEqual(first.content, second.content)
+
+        self.task.title = 'Renamed task'
+        self.task.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Renamed task')
+        self.assertEqual(row_cache.stats()['misses'], 3)
+
+        stats_url = reverse('row_cache_stats')
+        self.assertEqual(self.client.get(stats_url).status_code, 403)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        data = json.loads(self.client.get(stats_url).content.decode('utf-8'))
+        self.assertEqual(data['hits'], 3)
+
+    def test_list_my_tasks_view(self):
+        """
+        Test that my tasks lists only the open tasks of the user, with
+        their workload.
+        """
+        other = self.create_user(username='other')
+        task = self.create_task(title="Someone else's task")
+        task.assigned_user = other
+        task.save()
+        response = self.client.get(reverse('list_my_tasks'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(task.title for task in response.context_data['task_list']),
+            ['Task Ready for Review', 'Test task'])
+        self.assertEqual(response.context_data['workload'],
+                         {'open': 2, 'overdue': 2, 'ready_for_review': 1})
+
+    def test_workload_report_view(self):
+        """
+        Test that the workload of every user is counted and recounted only
+        for the users whose tasks changed.
+        """
+        other = self.create_user(username='other')
+        url = reverse('workload_report')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        workloads = dict((user.username, workload) for user, workload in
+                         response.context['workloads'])
+        self.assertEqual(workloads['ragsagar'],
+                         {'open': 2, 'overdue': 2, 'ready_for_review': 1})
+        self.assertEqual(workloads['other'],
+                         {'open': 0, 'overdue': 0, 'ready_for_review': 0})
+        # Users are counted in chunks to keep the number of parameters low.
+        user_pks = [self.user.pk, other.pk]
+        self.assertEqual(count_workloads(user_pks, local_today(), chunk_size=1),
+                         count_workloads(user_pks, local_today()))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'GROUP BY' in query['sql']])
+
+        self.task.assigned_user = other
+        self.task.due_date = local_today()
+        self.task.save()
+        response = self.client.get(url)
+        workloads = dict((user.username, workload) for user, workload in
+                         response.context['workloads'])
+        self.assertEqual(workloads['ragsagar'],
+                         {'open': 1, 'overdue': 1, 'ready_for_review': 1})
+        self.assertEqual(workloads['other'],
+                         {'open': 1, 'overdue': 0, 'ready_for_review': 0})
+
+    def test_throughput_json_view(self):
+        """
+        Test that tasks are bucketed per day and week and that closed
+        buckets are not counted again.
+        """
+        today = local_today()
+        monday = today - datetime.timedelta(days=today.weekday() + 7)
+        noon = datetime.datetime.combine(monday, datetime.time(12))
+        noon = timezone.make_aware(noon, timezone.get_current_timezone())
+        Task.objects.filter(pk=self.task.pk).update(created=noon)
+        Task.objects.filter(title='Task Ready for Review').update(
+            created=noon + datetime.timedelta(days=1),
+            completed_at=noon + datetime.timedelta(days=2))
+        Task.objects.filter(title='Completed Task').update(
+            reviewed_at=timezone.now())
+        url = reverse('throughput_json')
+        params = {'start': monday.isoformat(),
+                  'end': (monday + datetime.timedelta(days=2)).isoformat()}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['created'], [1, 1, 0])
+        self.assertEqual(data['submitted'], [0, 0, 1])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'GROUP BY' in query['sql']])
+
+        response = self.client.get(url, {'granularity': 'week',
+                                         'start': monday.isoformat()})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['buckets'],
+                         [monday.isoformat(),
+                          (monday + datetime.timedelta(days=7)).isoformat()])
+        self.assertEqual(data['created'], [2, 1])
+        self.assertEqual(data['completed'], [0, 1])
+
+        self.assertEqual(
+            self.client.get(url, {'granularity': 'year'}).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {'start': 'yesterday'}).status_code, 400)
+
+    def test_task_changes_view(self):
+        """
+        Test that polls get the unreviewed count and the tasks changed since
+        the last poll from the event log, and that up to date polls are
+        answered without reading the tasks.
+        """
+        url = reverse('task_changes')
+
+        def poll(**params):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            return json.loads(response.content.decode('utf-8'))
+
+        data = poll()
+        self.assertEqual((data['unreviewed'], data['changed']), (1, []))
+        Task.objects.transition(self.task.pk, 'ready', self.user)
+        other = self.create_task(title="Other task")
+        changes = poll(since=data['last'])
+        self.assertEqual(changes['unreviewed'], 2)
+        self.assertEqual(changes['changed'], sorted([self.task.pk, other.pk]))
+        self.assertIsNone(poll(since=changes['last'] + 99)['changed'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'since': changes['last']})
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'tasks_task' in query['sql']])
+
+    def test_task_changes_view_source(self):
+        """
+        Test that polls follow the change source in use.
+        """
+        source = ChangeSourceStandIn()
+        self.addCleanup(set_change_source, set_change_source(source))
+        url = reverse('task_changes')
+        response = self.client.get(url, {'since': 0})
+        self.assertEqual(response.status_code, 204)
+        source.changes.append([self.task.pk])
+        response = self.client.get(url, {'since': 0})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual((data['last'], data['changed']), (1, [self.task.pk]))
+
+    def test_transitions_json_view(self):
+        """
+        Test that transitions are counted per day from the event log, each
+        event once.
+        """
+        Task.objects.transition(self.task.pk, 'ready', self.user)
+        Task.objects.transition(self.task.pk, 'incomplete', self.user)
+        Task.objects.transition(self.task.pk, 'ready', self.user)
+        TaskEvent.objects.update(
+            created=timezone.now() - datetime.timedelta(seconds=5))
+        url = reverse('transitions_json')
+        for i in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content.decode('utf-8'))
+            self.assertEqual(data['days'][-1], local_today().isoformat())
+            self.assertEqual(data['ready'][-1], 2)
+            self.assertEqual(data['incomplete'][-1], 1)
+            self.assertEqual(data['complete'][-1], 0)
+        self.assertEqual(
+            self.client.get(url, {'start': '2014-02-30'}).status_code, 400)
+
+    def test_complete_transition_sets_reviewed_at(self):
+        """
+        Test that completing a task records when it was reviewed.
+        """
+        Task.objects.transition(self.task.pk, 'ready')
+        Task.objects.transition(self.task.pk, 'complete', user=self.user)
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual(task.reviewed_by, self.user)
+        self.assertIsNotNone(task.reviewed_at)
+        self.assertGreaterEqual(task.reviewed_at, task.completed_at)
+
+    def test_analytics_json_view(self):
+        """
+        Test the lead time and review wait percentiles, overall and per
+        slice.
+        """
+        now = datetime.datetime.combine(local_today(), datetime.time(18))
+        now = timezone.make_aware(now, timezone.get_current_timezone())
+        hour = datetime.timedelta(hours=1)
+        Task.objects.filter(pk=self.task.pk).update(
+            created=now - 10 * hour, completed_at=now - 8 * hour,
+            reviewed_at=now - 5 * hour)
+        Task.objects.filter(title='Task Ready for Review').update(
+            created=now - 10 * hour, completed_at=now - 6 * hour,
+            module='HR')
+        url = reverse('analytics_json')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        lead_time = data['lead_time']
+        self.assertEqual(lead_time['all'],
+                         {'count': 2, 'p50': 7200, 'p90': 14400,
+                          'p99': 14400})
+        self.assertEqual(sorted(lead_time['module']), ['CRM', 'HR'])
+        self.assertEqual(lead_time['module']['HR']['p50'], 14400)
+        self.assertEqual(lead_time['assignee']['ragsagar']['count'], 2)
+        review_wait = data['review_wait']
+        self.assertEqual(review_wait['all'],
+                         {'count': 1, 'p50': 10800, 'p90': 10800,
+                          'p99': 10800})
+        self.assertNotIn('HR', review_wait['module'])
+
+        yesterday = local_today() - datetime.timedelta(days=1)
+        response = self.client.get(url, {'end': yesterday.isoformat()})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['lead_time']['all']['count'], 0)
+        self.assertIsNone(data['lead_time']['all']['p50'])
+        self.assertEqual(
+            self.client.get(url, {'end': 'today'}).status_code, 400)
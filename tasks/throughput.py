@@ -0,0 +1,179 @@
+"""
+Number of tasks created, submitted for review and completed per day, week
+or month.
+
+Buckets are counted by the database after truncating the timestamps to the
+day or the month in the current timezone, weeks are rolled up from days.
+A bucket that lies entirely in the past can not change anymore, so it is
+cached for good and only the current one is counted on every request.
+"""
+import datetime
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Task, TaskArchive, local_today
+from .versions import bump_version, get_version
+
+
+VERSION_KEY = 'tasks:throughput_version'
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Series name -> (timestamp it is bucketed by, filters).
+SERIES = OrderedDict([
+    ('created', ('created', {})),
+    ('submitted', ('completed_at', {})),
+    ('completed', ('reviewed_at', {})),
+])
+
+# Number of buckets shown when no start date is given.
+DEFAULT_BUCKETS = {'day': 30, 'week': 12, 'month': 12}
+
+
+def get_bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def get_next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + datetime.timedelta(days=7)
+    if granularity == 'month':
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start + datetime.timedelta(days=1)
+
+
+def get_buckets(start, end, granularity):
+    """
+    Return the starts of the buckets that cover the days from start to end.
+    """
+    buckets = []
+    bucket = get_bucket_start(start, granularity)
+    while bucket <= end:
+        buckets.append(bucket)
+        bucket = get_next_bucket(bucket, granularity)
+    return buckets
+
+
+def get_default_start(end, granularity):
+    start = get_bucket_start(end, granularity)
+    for i in range(DEFAULT_BUCKETS[granularity] - 1):
+        start = get_bucket_start(start - datetime.timedelta(days=1),
+                                 granularity)
+    return start
+
+
+def to_datetime(day):
+    """
+    The start of the day in the current timezone.
+    """
+    value = datetime.datetime.combine(day, datetime.time.min)
+    if settings.USE_TZ:
+        value = timezone.make_aware(value, timezone.get_current_timezone())
+    return value
+
+
+def to_date(value):
+    # SQLite returns the truncated timestamps as strings.
+    if not isinstance(value, datetime.datetime):
+        value = parse_datetime(value)
+    return value.date()
+
+
+def count_buckets(series, unit, start, end):
+    """
+    Count the tasks of a series per day or month from start up to, but not
+    including, end with one grouped query on the tasks and one on the
+    archive.
+    """
+    field, filters = SERIES[series]
+    tzname = (timezone.get_current_timezone_name()
+              if settings.USE_TZ else None)
+    counts = defaultdict(int)
+    for model in (Task, TaskArchive):
+        column = '%s.%s' % (connection.ops.quote_name(model._meta.db_table),
+                            connection.ops.quote_name(field))
+        sql, params = connection.ops.datetime_trunc_sql(unit, column, tzname)
+        rows = (model.objects.filter(**filters)
+                             .filter(**{'%s__gte' % field: to_datetime(start),
+                                        '%s__lt' % field: to_datetime(end)})
+                             .order_by()
+                             .extra(select={'bucket': sql},
+                                    select_params=params)
+                             .values('bucket')
+                             .annotate(count=Count('pk')))
+        for row in rows:
+            counts[to_date(row['bucket'])] += row['count']
+    return counts
+
+
+def cache_key(version, series, unit, bucket):
+    # The field is part of the key so that changing what a series counts
+    # does not serve the old counts.
+    field, filters = SERIES[series]
+    return 'tasks:throughput:%s:%s:%s:%s:%s' % (version, series, field, unit,
+                                               bucket.isoformat())
+
+
+def get_series(series, unit, buckets, today):
+    """
+    Return the count of every day or month bucket of a series, from the
+    cache for the closed ones.
+    """
+    version = get_version(VERSION_KEY)
+    keys = dict((cache_key(version, series, unit, bucket), bucket)
+                for bucket in buckets)
+    counts = dict((keys[key], count)
+                  for key, count in cache.get_many(list(keys)).items())
+    missing = [bucket for bucket in buckets if bucket not in counts]
+    if missing:
+        end = get_next_bucket(missing[-1], unit)
+        counted = count_buckets(series, unit, missing[0], end)
+        closed = {}
+        for bucket in missing:
+            counts[bucket] = counted[bucket]
+            if get_next_bucket(bucket, unit) <= today:
+                closed[cache_key(version, series, unit, bucket)] = (
+                                                            counted[bucket])
+        cache.set_many(closed, None)
+    return counts
+
+
+def get_throughput(granularity, start=None, end=None):
+    """
+    Return the bucket starts and the counts of every series in them, for
+    the buckets covering the days from start to end.
+    """
+    today = local_today()
+    end = min(end or today, today)
+    start = start or get_default_start(end, granularity)
+    buckets = get_buckets(start, end, granularity)
+    # Weeks are rolled up from days.
+    unit = 'day' if granularity == 'week' else granularity
+    unit_buckets = get_buckets(buckets[0] if buckets else start, end, unit)
+    throughput = OrderedDict([('buckets', buckets)])
+    for series in SERIES:
+        counts = get_series(series, unit, unit_buckets, today)
+        totals = defaultdict(int)
+        for bucket, count in counts.items():
+            totals[get_bucket_start(bucket, granularity)] += count
+        throughput[series] = [totals[bucket] for bucket in buckets]
+    return throughput
+
+
+def invalidate_throughput():
+    """
+    Drop all cached buckets, e.g. after tasks were imported with past dates.
+    """
+    bump_version(VERSION_KEY)
@@ -3,10 +3,15 @@ from django.conf.urls import patterns, include, url
 from .views import (ListTasksView, CreateTaskView, DetailTaskView,
     UpdateTaskView, SetTaskReadyView, SetTaskIncompleteView, SetTaskCompletedView,
     ListIncompleteTasksView, ListUnReviewedTasksView, ListCompletedTasksView,
-    ReportHomeView, TasksJsonView)
+    ReportHomeView, TasksJsonView, BulkTransitionView, ListOverdueTasksView,
+    ListDueTodayTasksView, SearchTasksView, ExportTasksView, TaskListApiView,
+    TaskDetailApiView, TaskCommentsView, RowCacheStatsView, ListMyTasksView,
+    WorkloadReportView, ThroughputJsonView, AnalyticsJsonView,
+    TransitionsJsonView, TaskChangesView)
 
 urlpatterns = patterns('',
     url(r'^$', ListTasksView.as_view(), name='list_tasks'),
+    url(r'^mine/$', ListMyTasksView.as_view(), name='list_my_tasks'),
     url(r'^incomplete/$',
         ListIncompleteTasksView.as_view(),
         name='list_incomplete_tasks'),
@@ -16,8 +21,22 @@ urlpatterns = patterns('',
     url(r'^unreviewed/$',
         ListUnReviewedTasksView.as_view(),
         name='list_unreviewed_tasks'),
+    url(r'^overdue/$',
+        ListOverdueTasksView.as_view(),
+        name='list_overdue_tasks'),
+    url(r'^due-today/$',
+        ListDueTodayTasksView.as_view(),
+        name='list_due_today_tasks'),
+    url(r'^search/$', SearchTasksView.as_view(), name='search_tasks'),
+    url(r'^export/$', ExportTasksView.as_view(), name='export_tasks'),
     url(r'^create/$', CreateTaskView.as_view(), name='create_task'),
+    url(r'^transition/$',
+        BulkTransitionView.as_view(),
+        name='bulk_transition'),
     url(r'^(?P<pk>\d+)/$', DetailTaskView.as_view(), name='task_detail'),
+    url(r'^(?P<pk>\d+)/comments/$',
+        TaskCommentsView.as_view(),
+        name='task_comments'),
     url(r'^(?P<pk>\d+)/edit/$', UpdateTaskView.as_view(), name='edit_task'),
     url(r'^(?P<pk>\d+)/incomplete/$',
         SetTaskIncompleteView.as_view(),
@@ -28,9 +47,27 @@ urlpatterns = patterns('',
     url(r'^(?P<pk>\d+)/complete/$',
         SetTaskCompletedView.as_view(),
         name='set_task_complete'),
+    url(r'^api/tasks/$', TaskListApiView.as_view(), name='api_task_list'),
+    url(r'^api/tasks/(?P<pk>\d+)/$',
+        TaskDetailApiView.as_view(),
+        name='api_task_detail'),
+    url(r'^changes/$', TaskChangesView.as_view(), name='task_changes'),
+    url(r'^row-cache/$', RowCacheStatsView.as_view(), name='row_cache_stats'),
     url(r'report/$',
         ReportHomeView.as_view(),
         name='report_home'),
+    url(r'^report/workload/$',
+        WorkloadReportView.as_view(),
+        name='workload_report'),
+    url(r'^report/throughput/json/$',
+        ThroughputJsonView.as_view(),
+        name='throughput_json'),
+    url(r'^report/analytics/json/$',
+        AnalyticsJsonView.as_view(),
+        name='analytics_json'),
+    url(r'^report/transitions/json/$',
+        TransitionsJsonView.as_view(),
+        name='transitions_json'),
     url(r'report/task_by_status/json',
         TasksJsonView.as_view(),
         name='task_by_status_json')
@@ -0,0 +1,38 @@
+"""
+Versions kept in the cache that are moved on whenever the data they stand
+for changes, for cache keys and ETags to include.
+
+This module must not import the models: the receivers the models connect
+import it while the models are still loading.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def new_version():
+    # Start from the clock so that a version lost from the cache is never
+    # handed out again while data cached under it may still be around.
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """
+    Return the version stored under the cache key, starting a new one if it
+    is missing.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Move the version stored under the cache key on.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, new_version(), None)
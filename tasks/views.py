@@ -1,41 +1,251 @@
+import hashlib
 import json
+import time
+from collections import defaultdict, OrderedDict
 
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render
 from django.views.generic import (ListView, CreateView, DetailView, UpdateView,
     TemplateView, View)
+from django.conf import settings
+from django.contrib import comments as comments_app
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse_lazy
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import (HttpResponseRedirect, HttpResponse, Http404,
+    HttpResponseBadRequest, StreamingHttpResponse)
+from django.db.models import Count, Max, Sum
 from django.utils import timezone
-from django.db.models import Count
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.encoding import force_text
+from django.utils.functional import cached_property
+from django.utils.http import is_safe_url
+from django.views.decorators.http import condition
 
 from braces.views import (LoginRequiredMixin, StaffuserRequiredMixin,
         StaticContextMixin, JSONResponseMixin)
 from django_tables2.views import SingleTableMixin, SingleTableView
 
-from .models import Task
-from .tables import TaskTable
+from .analytics import get_analytics
+from .archive import get_archive_version
+from .changes import get_change_source
+from .counters import get_stats_version, get_status_count, get_status_counts
+from .events import get_transition_counts
+from .export import (EXPORT_COLUMNS, FORMATS, get_querysets, get_value,
+    iter_export)
+from .facets import TaskFilterForm, get_facet_counts, get_facet_generation
+from .models import (Task, TaskArchive, TaskStats,
+    TransitionConflict, local_today)
+from .pagination import CursorPaginator, InvalidCursor
+from .rowcache import row_cache
+from .throughput import GRANULARITIES, get_throughput
+from .workload import get_workloads
+from .tables import SearchTaskTable, TaskTable
 
-class BaseListTasksView(LoginRequiredMixin,  SingleTableView):
+class ConditionalGetMixin(object):
+    """
+    Answers GET requests whose `If-None-Match` or `If-Modified-Since` still
+    match with a 304, before the view builds its response.
+
+    Views return a cheap description of everything the response depends on
+    from `get_validator`, which the ETag is made of, and can add a
+    `get_last_modified`.
+    """
+    def get_validator(self):
+        return None
+
+    def get_last_modified(self):
+        return None
+
+    def get_etag(self):
+        # Messages are shown once, a cached page would swallow them.
+        if len(messages.get_messages(self.request)):
+            return None
+        validator = self.get_validator()
+        if validator is None:
+            return None
+        user = self.request.user
+        return hashlib.md5(repr((user.pk, user.is_staff, get_stats_version(),
+                                 validator)).encode('utf-8')).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        view = super(ConditionalGetMixin, self).dispatch
+        if request.method in ('GET', 'HEAD'):
+            view = condition(
+                etag_func=lambda request, *args, **kwargs: self.get_etag(),
+                last_modified_func=(lambda request, *args, **kwargs:
+                                    self.get_last_modified()))(view)
+        return view(request, *args, **kwargs)
+
+
+class BaseListTasksView(LoginRequiredMixin, ConditionalGetMixin,
+                        SingleTableView):
     """
     The base view that can list all tasks. Other actual view will apply just
     filters on this.
+
+    The `module`, `priority`, `type`, `assigned_user`, `due_after` and
+    `due_before` query parameters narrow any list as well, and the counts of
+    every facet are shown next to it.
+
+    A `q` query parameter narrows any list to the tasks matching it in full
+    text search, best matches first unless the table is sorted explicitly.
+
+    Views that set `cursor_pagination` page through the tasks with opaque
+    next/previous cursors in `cursor_ordering` order instead of page numbers,
+    which keeps deep pages as cheap as the first one. Those can also set
+    `include_archive` to list the archived tasks the filters match along with
+    the others.
     """
     model = Task
     table_class = TaskTable
     filters = {}
     exclude_filters = {}
+    include_archive = False
+    cursor_pagination = False
+    cursor_ordering = '-created'
+    cursor_page = None
 
-    def get_queryset(self):
+    @cached_property
+    def today(self):
         """
-        Exclude completed tasks from normal listing.
+        The date due dates are compared with, computed once per request.
         """
-        queryset = super(BaseListTasksView, self).get_queryset()
-        if self.filters:
-            queryset = queryset.filter(**self.filters)
+        return local_today()
+
+    @cached_property
+    def search_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    @cached_property
+    def filter_form(self):
+        return TaskFilterForm(self.request.GET)
+
+    def get_filters(self):
+        filters = dict(self.filters)
+        filters.update(self.filter_form.get_range_filters())
+        return filters
+
+    def get_base_queryset(self):
+        """
+        The tasks of the list before the facets are applied.
+        """
+        return self.narrow(super(BaseListTasksView, self).get_queryset())
+
+    def get_archive_base_queryset(self):
+        """
+        The archived tasks of the list before the facets are applied, or None
+        if the list leaves the archive out.
+        """
+        if not self.include_archive:
+            return None
+        return self.narrow(TaskArchive.objects.all())
+
+    def narrow(self, queryset):
+        filters = self.get_filters()
+        if filters:
+            queryset = queryset.filter(**filters)
         if self.exclude_filters:
             queryset = queryset.exclude(**self.exclude_filters)
+        if self.search_query:
+            queryset = queryset.search(self.search_query)
+        return queryset
+
+    def get_queryset(self):
+        queryset = self.get_base_queryset()
+        facet_filters = self.filter_form.get_facet_filters()
+        if facet_filters:
+            queryset = queryset.filter(**facet_filters)
+        return (queryset.select_related('assigned_user')
+                        .with_due_flags(self.today))
+
+    def get_archive_queryset(self):
+        queryset = self.get_archive_base_queryset()
+        if queryset is None:
+            return None
+        facet_filters = self.filter_form.get_facet_filters()
+        if facet_filters:
+            queryset = queryset.filter(**facet_filters)
+        # Archived tasks are complete, they are never overdue.
         return queryset.select_related('assigned_user')
 
+    def get_facets(self):
+        """
+        Return the facet counts, cached by everything that narrows the list.
+        """
+        selected = self.filter_form.get_facet_filters()
+        signature = repr((self.__class__.__name__,
+                          sorted(self.get_filters().items()),
+                          sorted(self.exclude_filters.items()),
+                          self.search_query,
+                          sorted(selected.items())))
+        querysets = [self.get_base_queryset()]
+        if self.include_archive:
+            querysets.append(self.get_archive_base_queryset())
+        return get_facet_counts(querysets, selected, signature)
+
+    def get_validator(self):
+        """
+        The number of tasks listed, their latest change and their activity,
+        along with everything the facets depend on. The archive only changes
+        in bulk, its version stands in for counting it.
+        """
+        aggregates = self.get_queryset().aggregate(Count('pk'),
+                                                   Max('last_modified'),
+                                                   Sum('comment_count'))
+        return (sorted(aggregates.items()), get_facet_generation(),
+                self.today,
+                get_archive_version() if self.include_archive else None)
+
+    def get_table_data(self):
+        """
+        In cursor mode hand the table only the rows of the requested page.
+        """
+        data = super(BaseListTasksView, self).get_table_data()
+        if not self.cursor_pagination:
+            return data
+        if self.include_archive:
+            data = [data, self.get_archive_queryset()]
+        paginator = CursorPaginator(data,
+                                    self.table_class._meta.per_page,
+                                    self.cursor_ordering)
+        try:
+            self.cursor_page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return self.cursor_page.object_list
+
+    def get_table_class(self):
+        if self.search_query and not self.cursor_pagination:
+            return SearchTaskTable
+        return super(BaseListTasksView, self).get_table_class()
+
+    def get_table(self, **kwargs):
+        """
+        A cursor page is already in its final order, so the table must not
+        sort it again. Search results keep their rank order unless the user
+        picks a column to sort on.
+        """
+        if self.cursor_pagination:
+            kwargs.setdefault('order_by', ())
+            kwargs.setdefault('orderable', False)
+        elif self.search_query:
+            kwargs.setdefault('order_by', '-search_rank')
+        return super(BaseListTasksView, self).get_table(**kwargs)
+
+    def get_table_pagination(self):
+        if self.cursor_pagination:
+            return False
+        return super(BaseListTasksView, self).get_table_pagination()
+
+    def get_context_data(self, **kwargs):
+        context = super(BaseListTasksView, self).get_context_data(**kwargs)
+        context['cursor_page'] = self.cursor_page
+        context['search_query'] = self.search_query
+        context['filter_form'] = self.filter_form
+        context['facets'] = self.get_facets()
+        return context
+
 
 class ListTasksView(BaseListTasksView):
     """
@@ -62,12 +272,159 @@ class ListUnReviewedTasksView(StaticContextMixin, BaseListTasksView):
 
 class ListCompletedTasksView(StaticContextMixin, BaseListTasksView):
     """
-    View to list only the tasks that are completed.
+    View to list only the tasks that are completed, archived ones included.
     """
     filters = {'status': Task.STATUS_CHOICES.complete}
     static_context = {"completed_menu": True}
+    cursor_pagination = True
+    include_archive = True
         
     
+class ListOverdueTasksView(StaticContextMixin, BaseListTasksView):
+    """
+    View to list open tasks that crossed their due date.
+    """
+    filters = {'status__in': Task.OPEN_STATUSES}
+    static_context = {"overdue_menu": True}
+
+    def get_filters(self):
+        filters = super(ListOverdueTasksView, self).get_filters()
+        filters['due_date__lt'] = self.today
+        return filters
+
+
+class ListDueTodayTasksView(StaticContextMixin, BaseListTasksView):
+    """
+    View to list open tasks that are due today.
+    """
+    filters = {'status__in': Task.OPEN_STATUSES}
+    static_context = {"due_today_menu": True}
+
+    def get_filters(self):
+        filters = super(ListDueTodayTasksView, self).get_filters()
+        filters['due_date'] = self.today
+        return filters
+
+
+class ListMyTasksView(StaticContextMixin, BaseListTasksView):
+    """
+    View to list the open tasks assigned to the logged in user, along with
+    a summary of their workload.
+    """
+    filters = {'status__in': Task.OPEN_STATUSES}
+    static_context = {"mine_menu": True}
+
+    def get_filters(self):
+        filters = super(ListMyTasksView, self).get_filters()
+        filters['assigned_user'] = self.request.user.pk
+        return filters
+
+    def get_context_data(self, **kwargs):
+        context = super(ListMyTasksView, self).get_context_data(**kwargs)
+        user_pk = self.request.user.pk
+        context['workload'] = get_workloads([user_pk], self.today)[user_pk]
+        return context
+
+
+class SearchTasksView(StaticContextMixin, BaseListTasksView):
+    """
+    View to search all tasks, completed ones included, by the `q` parameter.
+
+    The archive has no search rank to merge its matches into the results
+    by, the newest of them are listed below the results instead. The
+    completed list takes the same query and pages through all of them.
+    """
+    static_context = {"search_menu": True}
+    archived_matches_limit = 10
+
+    def get_base_queryset(self):
+        if not self.search_query:
+            return Task.objects.none()
+        return super(SearchTasksView, self).get_base_queryset()
+
+    def get_archived_matches(self):
+        """
+        Return the newest archived tasks the search matches, one more than
+        are shown to tell if there are others.
+        """
+        if not self.search_query:
+            return []
+        queryset = self.narrow(TaskArchive.objects.all())
+        facet_filters = self.filter_form.get_facet_filters()
+        if facet_filters:
+            queryset = queryset.filter(**facet_filters)
+        return list(queryset.order_by('-created', '-pk')
+                            [:self.archived_matches_limit + 1])
+
+    def get_validator(self):
+        return (super(SearchTasksView, self).get_validator(),
+                get_archive_version())
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchTasksView, self).get_context_data(**kwargs)
+        matches = self.get_archived_matches()
+        context['archived_matches'] = matches[:self.archived_matches_limit]
+        context['more_archived_matches'] = (
+            len(matches) > self.archived_matches_limit)
+        return context
+
+
+class TaskChangesView(LoginRequiredMixin, JSONResponseMixin, View):
+    """
+    Return the number of unreviewed tasks, the id of the latest change and
+    the primary keys of the tasks changed after the change `since`, so that
+    open pages can follow without reloading. `changed` is null when the
+    changes are not all known (anymore). A page that is up to date gets an
+    empty 204 response, which costs no query.
+
+    Pages poll this instead of holding a connection open, which would tie
+    up a whole worker of a synchronous server. The changes come from the
+    change source (see `tasks.changes`), so changes made by any process are
+    seen.
+    """
+    def get(self, request, *args, **kwargs):
+        source = get_change_source()
+        try:
+            since = int(request.GET['since'])
+        except (KeyError, ValueError):
+            since = None
+        if since is not None and since == source.get_last_id():
+            return HttpResponse(status=204)
+        latest, changed = source.get_changes(since)
+        return self.render_json_response({
+            'last': latest,
+            'unreviewed': get_status_count(
+                                Task.STATUS_CHOICES.ready_for_review),
+            'changed': changed,
+        })
+
+
+class ExportTasksView(LoginRequiredMixin, View):
+    """
+    Stream all tasks, archived ones included, or those in the `status`
+    given, as CSV or JSON lines depending on `format`.
+    """
+    content_types = {
+        'csv': 'text/csv; charset=utf-8',
+        'jsonl': 'application/x-ndjson; charset=utf-8',
+    }
+
+    def get(self, request, *args, **kwargs):
+        format = request.GET.get('format', 'csv')
+        if format not in FORMATS:
+            return HttpResponseBadRequest("Unknown format.")
+        try:
+            querysets = get_querysets(request.GET.get('status'))
+        except KeyError:
+            return HttpResponseBadRequest("Unknown status.")
+        response = StreamingHttpResponse(
+                            iter_export(querysets, format),
+                            content_type=self.content_types[format])
+        response['Content-Disposition'] = (
+            'attachment; filename="tasks.%s"' % format)
+        return response
+
+
 class CreateTaskView(LoginRequiredMixin, CreateView):
     """
     View to create new tasks.
@@ -90,16 +447,110 @@ class CreateTaskView(LoginRequiredMixin, CreateView):
         """
         self.object = form.save(commit=False)
         self.object.created_by = self.request.user
+        self.object.changed_by = self.request.user
         self.object.save()
         return HttpResponseRedirect(reverse_lazy('list_tasks'))
 
 
-class DetailTaskView(LoginRequiredMixin, DetailView):
+COMMENTS_PER_PAGE = 20
+
+
+def get_comment_page(task, cursor=None):
+    """
+    Return a page of the comments `get_comment_list` would show for the task,
+    newest first and with their users. Raises `InvalidCursor`.
+    """
+    # Comments of archived tasks still belong to the task model.
+    comments = (comments_app.get_model().objects
+                .for_model(Task)
+                .filter(object_pk=force_text(task.pk),
+                        site__pk=settings.SITE_ID,
+                        is_public=True))
+    if getattr(settings, 'COMMENTS_HIDE_REMOVED', True):
+        comments = comments.filter(is_removed=False)
+    paginator = CursorPaginator(comments.select_related('user'),
+                                COMMENTS_PER_PAGE,
+                                '-submit_date')
+    return paginator.page(cursor)
+
+
+def get_task_or_404(pk, related=()):
+    """
+    Return the task with the given primary key, or its archived copy, with
+    the `related` users.
+    """
+    for model in (Task, TaskArchive):
+        task = model.objects.select_related(*related).filter(pk=pk).first()
+        if task is not None:
+            return task
+    raise Http404("Task does not exist.")
+
+
+# Seconds a revalidated detail page may be reused. The comment form it
+# embeds is rejected two hours after it was rendered.
+DETAIL_PAGE_LIFETIME = 30 * 60
+
+
+class DetailTaskView(LoginRequiredMixin, ConditionalGetMixin, DetailView):
     """
     View to show the details of a task.
+
+    The task comes with its users and the newest comments with theirs, so
+    the page costs the same few queries however long the follow up is. Older
+    comments are loaded on demand from `TaskCommentsView`.
+
+    Tasks that were archived are read from the archive.
     """
     model = Task
 
+    def get_object(self, queryset=None):
+        return get_task_or_404(self.kwargs['pk'],
+                               ('created_by', 'assigned_user', 'reviewed_by'))
+
+    @cached_property
+    def validator_row(self):
+        """
+        When the task last changed, how many comments it has and whether it
+        is archived, if it exists. Comments do not touch `last_modified`.
+        """
+        for model in (Task, TaskArchive):
+            row = (model.objects.filter(pk=self.kwargs['pk'])
+                                .values_list('last_modified', 'comment_count')
+                                .first())
+            if row is not None:
+                return row + (model is TaskArchive,)
+
+    def get_validator(self):
+        """
+        The task's row, today for the due alerts, and the current slice of
+        time so that the comment form and its timestamp are never served
+        older than `DETAIL_PAGE_LIFETIME`. No Last-Modified is sent, it could
+        not tell the pages of two days (or slices) apart.
+        """
+        if self.validator_row is None:
+            return None
+        return (self.validator_row, local_today(),
+                int(time.time() // DETAIL_PAGE_LIFETIME))
+
+    def get_context_data(self, **kwargs):
+        context = super(DetailTaskView, self).get_context_data(**kwargs)
+        context['comment_page'] = get_comment_page(self.object)
+        return context
+
+
+class TaskCommentsView(LoginRequiredMixin, View):
+    """
+    Render a page of the comments of a task, the page older than `cursor`.
+    """
+    def get(self, request, *args, **kwargs):
+        task = get_task_or_404(kwargs['pk'])
+        try:
+            comment_page = get_comment_page(task, request.GET.get('cursor'))
+        except InvalidCursor:
+            return HttpResponseBadRequest("Invalid cursor.")
+        return render(request, 'tasks/comment_list.html',
+                      {'task': task, 'comment_page': comment_page})
+
 
 class UpdateTaskView(LoginRequiredMixin, UpdateView):
     """
@@ -116,108 +567,355 @@ class UpdateTaskView(LoginRequiredMixin, UpdateView):
             return HttpResponseRedirect(self.get_success_url())
         return super(UpdateTaskView, self).post(request, *args, **kwargs)
 
+    def form_valid(self, form):
+        form.instance.changed_by = self.request.user
+        return super(UpdateTaskView, self).form_valid(form)
+
 
-class SetTaskReadyView(LoginRequiredMixin, View):
+class BaseTransitionView(LoginRequiredMixin, View):
     """
-    View to set a task ready for review.
+    Base view to move a single task through one of `Task.TRANSITIONS`.
+
+    The form may post the `last_modified` of the task it was rendered from,
+    the transition is then refused with a 409 if the task changed since.
     """
+    transition = None
+
     def post(self, request, *args, **kwargs):
         """
-        Set the task as ready for review.
+        Apply the transition with a guarded UPDATE. The task is not loaded,
+        only its tracked fields are read first to check the transition and
+        to describe the change, and its status again if the UPDATE missed.
         """
-        task = get_object_or_404(Task, pk=self.kwargs.get('pk'))
-        task.status = Task.STATUS_CHOICES.ready_for_review
-        task.completed_at = timezone.now()
-        task.save()
-        return HttpResponseRedirect(task.get_absolute_url())
+        pk = int(self.kwargs.get('pk'))
+        last_modified = None
+        if request.POST.get('last_modified'):
+            try:
+                last_modified = parse_datetime(request.POST['last_modified'])
+            except ValueError:
+                pass
+            if last_modified is None:
+                return HttpResponseBadRequest("Invalid last_modified.")
+        try:
+            Task.objects.transition(pk, self.transition, request.user,
+                                    last_modified)
+        except Task.DoesNotExist:
+            raise Http404
+        except TransitionConflict as e:
+            return HttpResponse(str(e), status=409)
+        return HttpResponseRedirect(reverse_lazy('task_detail',
+                                                 kwargs={'pk': pk}))
+
+
+class SetTaskReadyView(BaseTransitionView):
+    """
+    View to set a task ready for review.
+    """
+    transition = 'ready'
 
 
-class SetTaskIncompleteView(LoginRequiredMixin, View):
+class SetTaskIncompleteView(BaseTransitionView):
     """
     View to set a task back to incomplete
     """
-    def post(self, request, *args, **kwargs):
-        """
-        View to set a task as not ready for review.
-        """
-        task = get_object_or_404(Task, pk=self.kwargs.get('pk'))
-        task.status = Task.STATUS_CHOICES.incomplete
-        task.save()
-        return HttpResponseRedirect(task.get_absolute_url())
+    transition = 'incomplete'
    
 
-class SetTaskCompletedView(LoginRequiredMixin, StaffuserRequiredMixin, View):
+class SetTaskCompletedView(StaffuserRequiredMixin, BaseTransitionView):
     """
     View to set a task as completed
     """
     raise_exception = True
+    transition = 'complete'
 
+class BulkTransitionView(LoginRequiredMixin, JSONResponseMixin, View):
+    """
+    View to apply a status transition to many tasks at once.
+    """
     def post(self, request, *args, **kwargs):
         """
-        View to set a task as completed.
+        Apply the posted transition to all posted tasks with one UPDATE and
+        report the outcome for every task.
         """
-        task = get_object_or_404(Task, pk=self.kwargs.get('pk'))
-        task.status = Task.STATUS_CHOICES.complete
-        task.reviewed_by = request.user
-        task.save()
-        return HttpResponseRedirect(task.get_absolute_url())
+        name = request.POST.get('transition')
+        if name not in Task.TRANSITIONS:
+            return HttpResponseBadRequest("Unknown transition.")
+        # Same rule as SetTaskCompletedView.
+        if name == 'complete' and not request.user.is_staff:
+            raise PermissionDenied
+        try:
+            pks = set(int(pk) for pk in request.POST.getlist('tasks'))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid task id.")
+        result = Task.objects.filter(pk__in=pks).apply_transition(
+                                                        name, request.user)
+        for pk in pks - set(result.succeeded) - set(result.failed):
+            result.failed[pk] = 'Task does not exist.'
+        if request.is_ajax():
+            return self.render_json_response({
+                'succeeded': sorted(result.succeeded),
+                'failed': result.failed,
+            })
+        if result.succeeded:
+            messages.success(request, "Updated %d task(s)." %
+                                      len(result.succeeded))
+        for pk, reason in sorted(result.failed.items()):
+            messages.error(request, "Task #%d: %s" % (pk, reason))
+        return HttpResponseRedirect(self.get_success_url())
 
-class ReportHomeView(LoginRequiredMixin, TemplateView):
+    def get_success_url(self):
+        """
+        Go back to the list the tasks were selected on.
+        """
+        next_url = self.request.POST.get('next')
+        if next_url and is_safe_url(next_url, host=self.request.get_host()):
+            return next_url
+        return reverse_lazy('list_tasks')
+
+class ReportHomeView(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
     """
     View to render template for report home view
     """
     template_name = 'tasks/report.html'
 
+    def get_validator(self):
+        # Only the stats version matters, which every ETag covers.
+        return 'report'
+
     def get_context_data(self, **kwargs):
         """
         Adding some data to the context
         """
         context = super(ReportHomeView, self).get_context_data(**kwargs)
-        tasks = Task.objects.all()
-        incomplete_tasks = tasks.filter(
-                                status=Task.STATUS_CHOICES.incomplete)
-        unreviewed_tasks = tasks.filter(
-                                status=Task.STATUS_CHOICES.ready_for_review)
-        completed_tasks = tasks.filter(
-                                status=Task.STATUS_CHOICES.complete)
-        context['incomplete_task_count'] = incomplete_tasks.count()
-        context['unreviewed_tasks_count'] = unreviewed_tasks.count()
-        context['completed_tasks'] = completed_tasks.count()
+        status_counts = get_status_counts()
+        context['incomplete_task_count'] = status_counts[
+                                    Task.STATUS_CHOICES.incomplete]
+        context['unreviewed_tasks_count'] = status_counts[
+                                    Task.STATUS_CHOICES.ready_for_review]
+        context['completed_tasks'] = status_counts[
+                                    Task.STATUS_CHOICES.complete]
         context['report_menu'] = True
         return context
 
-class TasksJsonView(LoginRequiredMixin, JSONResponseMixin, View):
+def get_date_range(request):
+    """
+    Return the `start` and `end` dates given in the query string, raising
+    ValueError for an invalid one.
+    """
+    dates = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        if not value:
+            continue
+        try:
+            dates[name] = parse_date(value)
+        except ValueError:
+            dates[name] = None
+        if dates[name] is None:
+            raise ValueError("Invalid %s date." % name)
+    return dates
+
+
+class ThroughputJsonView(LoginRequiredMixin, JSONResponseMixin, View):
+    """
+    Returns the number of tasks created, submitted for review and completed
+    per `granularity` (day, week or month) between the `start` and `end`
+    dates.
+    """
+    def get(self, request, *args, **kwargs):
+        granularity = request.GET.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return HttpResponseBadRequest("Unknown granularity.")
+        try:
+            dates = get_date_range(request)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        throughput = get_throughput(granularity, **dates)
+        throughput['granularity'] = granularity
+        return self.render_json_response(throughput)
+
+
+class TransitionsJsonView(LoginRequiredMixin, JSONResponseMixin, View):
+    """
+    Returns how many tasks made every transition per day between the
+    `start` and `end` dates, counted from the event log.
+    """
+    def get(self, request, *args, **kwargs):
+        try:
+            dates = get_date_range(request)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        return self.render_json_response(get_transition_counts(**dates))
+
+
+class AnalyticsJsonView(LoginRequiredMixin, JSONResponseMixin, View):
+    """
+    Returns the percentiles of lead time and review wait, in seconds, of
+    the tasks submitted for review between the `start` and `end` dates,
+    overall and per module, priority and assignee.
+    """
+    def get(self, request, *args, **kwargs):
+        try:
+            dates = get_date_range(request)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        return self.render_json_response(get_analytics(**dates))
+
+
+class WorkloadReportView(LoginRequiredMixin, TemplateView):
+    """
+    View to show how many open, overdue and unreviewed tasks every active
+    user has.
+    """
+    template_name = 'tasks/workload.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(WorkloadReportView, self).get_context_data(**kwargs)
+        users = list(get_user_model().objects.filter(is_active=True)
+                                             .order_by('username'))
+        workloads = get_workloads([user.pk for user in users])
+        context['workloads'] = sorted(
+            [(user, workloads[user.pk]) for user in users],
+            key=lambda item: (-item[1]['open'], item[0].username))
+        context['report_menu'] = True
+        return context
+
+
+class TasksJsonView(LoginRequiredMixin, ConditionalGetMixin,
+                    JSONResponseMixin, View):
     """
     Returns the task by its status
     """
+    def get_validator(self):
+        return 'task_by_status'
     def get(self, request, *args, **kwargs):
         """
         Get all task and return a json data of tasks 
         by its status
         """
-        tasks = Task.objects.all()
-        tasks_by_status = (
-            tasks.values('status'
-                         ).annotate(count=Count('status')
-                         ).order_by('-count'))
-        for item in tasks_by_status:
-            item['label'] = Task.STATUS_CHOICES[item.get('status')]
-            item['data'] = item.get('count')
-            del item['status']
-            del item['count']
-        task_by_module = (
-            tasks.values('module'
-                         ).annotate(count=Count('module')
-                         ).order_by('-count'))
-        for item in task_by_module:
-            item['label'] = item.get('module')
-            item['data'] = item.get('count')
-            del item['module']
-            del item['count']
+        status_counts = sorted(get_status_counts().items(),
+                               key=lambda item: (-item[1], item[0]))
+        tasks_by_status = [
+            {'label': Task.STATUS_CHOICES[status], 'data': count}
+            for status, count in status_counts if count
+        ]
+        module_counts = defaultdict(int)
+        for stats in TaskStats.objects.filter(count__gt=0):
+            module_counts[stats.module] += stats.count
+        task_by_module = [
+            {'label': module, 'data': count}
+            for module, count in sorted(module_counts.items(),
+                                        key=lambda item: (-item[1], item[0]))
+        ]
         response = {
-            'task_by_status' : list(tasks_by_status),
-            'task_by_module' : list(task_by_module)
+            'task_by_status' : tasks_by_status,
+            'task_by_module' : task_by_module
         }
         return self.render_json_response(response)
 
 
+class RowCacheStatsView(StaffuserRequiredMixin, JSONResponseMixin, View):
+    """
+    Show the size and the hit and miss counts of this process's table row
+    cache, to tune `TASK_ROW_CACHE_SIZE`.
+    """
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        return self.render_json_response(row_cache.stats())
+
+
+class TaskApiMixin(LoginRequiredMixin, JSONResponseMixin):
+    """
+    Serves tasks as `values()` rows straight to the JSON encoder, without
+    creating model instances. The `fields` parameter takes a comma separated
+    list of the fields to return, all of them by default.
+    """
+    lookups = OrderedDict(EXPORT_COLUMNS)
+
+    def get_fields(self):
+        """
+        Return the requested fields, or None if any of them is unknown.
+        """
+        fields = self.request.GET.get('fields')
+        if not fields:
+            return list(self.lookups)
+        fields = [field.strip() for field in fields.split(',')]
+        if any(field not in self.lookups for field in fields):
+            return None
+        return fields
+
+    def get_values(self, queryset, fields):
+        lookups = set(self.lookups[field] for field in fields)
+        # The cursor is built from these.
+        lookups.update(['pk', 'created'])
+        return queryset.values(*lookups)
+
+    def serialize(self, row, fields):
+        return OrderedDict((field, get_value(field, row[self.lookups[field]]))
+                           for field in fields)
+
+    def render_error(self, message, status):
+        return self.render_json_response({'error': message}, status=status)
+
+
+class TaskListApiView(TaskApiMixin, View):
+    """
+    List tasks newest first, archived ones included, a page of `limit` at a
+    time with opaque `next` and `previous` cursors.
+
+    They can be narrowed by `status` (see `tasks.export.STATUS_FILTERS`),
+    by `q` and by the facet parameters of the list views.
+    """
+    default_limit = 50
+    max_limit = 500
+
+    def get(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        if fields is None:
+            return self.render_error("Unknown field.", 400)
+        try:
+            limit = int(request.GET.get('limit', self.default_limit))
+        except ValueError:
+            return self.render_error("Invalid limit.", 400)
+        limit = min(max(limit, 1), self.max_limit)
+        try:
+            querysets = get_querysets(request.GET.get('status'))
+        except KeyError:
+            return self.render_error("Unknown status.", 400)
+        filter_form = TaskFilterForm(request.GET)
+        query = request.GET.get('q', '').strip()
+        values = []
+        for queryset in querysets:
+            queryset = queryset.filter(**filter_form.get_range_filters())
+            queryset = queryset.filter(**filter_form.get_facet_filters())
+            if query:
+                queryset = queryset.search(query)
+            values.append(self.get_values(queryset, fields))
+        paginator = CursorPaginator(values, limit)
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return self.render_error("Invalid cursor.", 400)
+        return self.render_json_response({
+            'results': [self.serialize(row, fields) for row in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+
+
+class TaskDetailApiView(TaskApiMixin, View):
+    """
+    Return a single task.
+    """
+    def get(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        if fields is None:
+            return self.render_error("Unknown field.", 400)
+        # Archived tasks are served from the archive.
+        for model in (Task, TaskArchive):
+            row = self.get_values(model.objects.filter(pk=kwargs['pk']),
+                                  fields).first()
+            if row is not None:
+                return self.render_json_response(self.serialize(row, fields))
+        return self.render_error("Task does not exist.", 404)
@@ -0,0 +1,320 @@
+"""
+Outbound webhooks for task creations and transitions.
+
+Requests never call an endpoint: their changes are already appended to the
+event log (see `tasks.events`), and the `send_webhooks` command moves the
+events into the `WebhookDelivery` outbox, one row per endpoint, before it
+posts the due deliveries. The posts run in a bounded thread pool that does
+nothing but HTTP; the database is only touched from the calling thread.
+
+Every endpoint is rate limited on its own, failed deliveries are retried
+with exponential backoff and the ones that run out of attempts are kept
+as dead for inspection in the admin.
+"""
+import datetime
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.urlresolvers import reverse
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .events import consume
+from .models import Task, TaskEvent, WebhookDelivery, WebhookEndpoint
+from .notifications import get_task_titles
+
+
+logger = logging.getLogger(__name__)
+
+WEBHOOKS_CONSUMER = 'webhooks'
+
+# The event kinds that are sent, by the name endpoints see.
+WEBHOOK_EVENTS = {
+    TaskEvent.KIND_CHOICES.created: 'task.created',
+    TaskEvent.KIND_CHOICES.transitioned: 'task.transitioned',
+}
+
+WEBHOOK_WORKERS = getattr(settings, 'TASK_WEBHOOK_WORKERS', 4)
+WEBHOOK_TIMEOUT = 10
+
+# Delivery attempts before a delivery is dead, waiting BACKOFF, 2 * BACKOFF,
+# ... seconds in between.
+WEBHOOK_ATTEMPTS = getattr(settings, 'TASK_WEBHOOK_ATTEMPTS', 8)
+WEBHOOK_BACKOFF = 30
+
+DELIVERY_BATCH_SIZE = 100
+
+SIGNATURE_HEADER = 'X-Task-Signature'
+
+
+def build_payload(event, title, domain):
+    statuses = Task.STATUS_CHOICES
+    url = reverse('task_detail', kwargs={'pk': event.task_id})
+    task = OrderedDict([
+        ('id', event.task_id),
+        ('title', title),
+        ('status', statuses[event.status]),
+        ('old_status', (statuses[event.old_status]
+                        if event.old_status is not None else None)),
+        ('module', event.module),
+        ('assigned_user', event.assigned_user_id),
+        ('due_date', event.due_date),
+        ('url', 'http://%s%s' % (domain, url)),
+    ])
+    return json.dumps(OrderedDict([
+        ('id', event.pk),
+        ('event', WEBHOOK_EVENTS[event.kind]),
+        ('created', event.created),
+        ('user', event.user_id),
+        ('task', task),
+    ]), cls=DjangoJSONEncoder)
+
+
+def enqueue(events):
+    """
+    Add a delivery of every event that is sent to every active endpoint,
+    with one INSERT.
+    """
+    events = [event for event in events
+              if event.kind in WEBHOOK_EVENTS and event.task_id is not None]
+    endpoints = list(WebhookEndpoint.objects.filter(is_active=True))
+    if not events or not endpoints:
+        return
+    titles = get_task_titles(set(event.task_id for event in events))
+    domain = Site.objects.get_current().domain
+    now = timezone.now()
+    deliveries = []
+    for event in events:
+        payload = build_payload(event, titles.get(event.task_id), domain)
+        deliveries.extend(WebhookDelivery(endpoint=endpoint,
+                                          event_id=event.pk,
+                                          payload=payload,
+                                          next_attempt_at=now)
+                          for endpoint in endpoints)
+    WebhookDelivery.objects.bulk_create(deliveries)
+
+
+def sign(secret, body):
+    """
+    Return the signature header value of a request body.
+    """
+    digest = hmac.new(secret.encode('utf-8'), body, hashlib.sha256)
+    return 'sha256=' + digest.hexdigest()
+
+
+def post(url, secret, delivery_id, body, timeout=WEBHOOK_TIMEOUT):
+    """
+    Post a payload and return None, or why it was not accepted. Runs in the
+    worker threads, so it must not touch the database.
+    """
+    request = urllib.request.Request(url, data=body, headers={
+        'Content-Type': 'application/json',
+        'X-Task-Delivery': str(delivery_id),
+        SIGNATURE_HEADER: sign(secret, body),
+    })
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+        response.read()
+        response.close()
+    except (urllib.error.URLError, http.client.HTTPException,
+            socket.error, ValueError) as e:
+        return str(e) or e.__class__.__name__
+
+
+class RateLimiter(object):
+    """
+    A token bucket that allows `rate` deliveries per second on average and
+    bursts of up to `burst` of them.
+    """
+    def __init__(self, rate, burst=None, clock=time.time):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        return self.acquire(1) == 1
+
+    def acquire(self, count):
+        """
+        Take up to `count` deliveries and return how many were allowed.
+        """
+        with self.lock:
+            self.refill()
+            allowed = min(count, int(self.tokens))
+            self.tokens -= allowed
+            return allowed
+
+    def release(self, count):
+        """
+        Give back deliveries that were allowed but not made.
+        """
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + count)
+
+    def get_delay(self):
+        """
+        Return the seconds until the next delivery is allowed.
+        """
+        with self.lock:
+            self.refill()
+            return max(0, (1 - self.tokens) / self.rate)
+
+
+class Dispatcher(object):
+    """
+    Posts the due deliveries through a pool of `workers` threads. The rate
+    limiters live as long as the dispatcher, so a long running worker keeps
+    to the limits across runs.
+    """
+    def __init__(self, workers=WEBHOOK_WORKERS, attempts=WEBHOOK_ATTEMPTS,
+                 backoff=WEBHOOK_BACKOFF, timeout=WEBHOOK_TIMEOUT,
+                 clock=time.time):
+        self.workers = workers
+        self.attempts = attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.clock = clock
+        self.executor = None
+        self.limiters = {}
+
+    def get_limiter(self, endpoint):
+        limiter = self.limiters.get(endpoint.pk)
+        if limiter is None or limiter.rate != endpoint.rate_limit:
+            limiter = RateLimiter(endpoint.rate_limit, clock=self.clock)
+            self.limiters[endpoint.pk] = limiter
+        return limiter
+
+    def claim(self, batch_size=DELIVERY_BATCH_SIZE):
+        """
+        Return the due deliveries the rate limits allow, pushed back by the
+        time they may take so that other workers leave them alone.
+
+        The endpoints are claimed from one at a time, the one waiting the
+        longest first, so a throttled endpoint's backlog does not hold up the
+        others. Its deliveries are pushed back until the limit allows the
+        next one; deliveries left over once the batch is full stay due.
+        """
+        now = timezone.now()
+        lease = datetime.timedelta(seconds=self.timeout * 2)
+        due = WebhookDelivery.objects.filter(
+            status=WebhookDelivery.STATUS_CHOICES.pending,
+            next_attempt_at__lte=now)
+        claimed = []
+        with transaction.atomic():
+            waiting = list(due.values('endpoint')
+                              .annotate(oldest=Min('next_attempt_at'))
+                              .order_by('oldest', 'endpoint'))
+            endpoints = WebhookEndpoint.objects.in_bulk(
+                [row['endpoint'] for row in waiting])
+            for row in waiting:
+                if len(claimed) >= batch_size:
+                    break
+                endpoint = endpoints[row['endpoint']]
+                limiter = self.get_limiter(endpoint)
+                room = batch_size - len(claimed)
+                allowed = limiter.acquire(room)
+                deliveries = []
+                if allowed:
+                    deliveries = list(due.filter(endpoint=endpoint)
+                                         .select_for_update()
+                                         .order_by('next_attempt_at', 'id')
+                                         [:allowed])
+                limiter.release(allowed - len(deliveries))
+                for delivery in deliveries:
+                    delivery.endpoint = endpoint
+                claimed.extend(deliveries)
+                if allowed < room and len(deliveries) == allowed:
+                    # The rest has to wait for the limit.
+                    delay = datetime.timedelta(seconds=limiter.get_delay())
+                    (due.filter(endpoint=endpoint)
+                        .exclude(pk__in=[d.pk for d in deliveries])
+                        .update(next_attempt_at=now + delay))
+            if claimed:
+                (WebhookDelivery.objects
+                                .filter(pk__in=[d.pk for d in claimed])
+                                .update(next_attempt_at=now + lease))
+        return claimed
+
+    def record(self, delivery, error):
+        statuses = WebhookDelivery.STATUS_CHOICES
+        now = timezone.now()
+        delivery.attempts += 1
+        if error is None:
+            delivery.status = statuses.delivered
+            delivery.last_error = ''
+        else:
+            delivery.last_error = error
+            if delivery.attempts >= self.attempts:
+                delivery.status = statuses.dead
+                logger.error("Gave up on webhook delivery %d to %s: %s",
+                             delivery.pk, delivery.endpoint.url, error)
+            else:
+                delivery.next_attempt_at = now + datetime.timedelta(
+                    seconds=self.backoff * 2 ** (delivery.attempts - 1))
+        delivery.save(update_fields=['status', 'attempts', 'next_attempt_at',
+                                     'last_error'])
+
+    def deliver(self):
+        """
+        Post the deliveries that are due and return how many were posted.
+        """
+        deliveries = self.claim()
+        if not deliveries:
+            return 0
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = [(delivery,
+                    self.executor.submit(post, delivery.endpoint.url,
+                                         delivery.endpoint.secret,
+                                         delivery.pk,
+                                         delivery.payload.encode('utf-8'),
+                                         self.timeout))
+                   for delivery in deliveries]
+        for delivery, future in futures:
+            self.record(delivery, future.result())
+        return len(deliveries)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def send_webhooks(dispatcher=None):
+    """
+    Queue the deliveries of the events since the last run and post the due
+    ones. Return how many were posted. Events from before the first run
+    are skipped.
+    """
+    own_dispatcher = dispatcher is None
+    if own_dispatcher:
+        dispatcher = Dispatcher()
+    try:
+        consume(WEBHOOKS_CONSUMER, enqueue, from_end=True)
+        return dispatcher.deliver()
+    finally:
+        if own_dispatcher:
+            dispatcher.close()
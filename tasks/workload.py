@@ -0,0 +1,89 @@
+"""
+Open, overdue and ready for review task counts per assignee.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Task, local_today
+
+
+# Entries are dropped when a task of the user changes (see receivers), the
+# timeout only bounds writes that bypass the signals.
+WORKLOAD_CACHE_TIMEOUT = getattr(settings, 'TASK_WORKLOAD_CACHE_TIMEOUT', 300)
+
+# Users counted per query, well below SQLite's limit of 999 parameters.
+WORKLOAD_CHUNK_SIZE = 500
+
+
+def workload_cache_key(user_pk, today):
+    # Overdue counts change with the date.
+    return 'tasks:workload:%s:%s' % (today.isoformat(), user_pk)
+
+
+def empty_workload():
+    return {'open': 0, 'overdue': 0, 'ready_for_review': 0}
+
+
+def count_workloads(user_pks, today, chunk_size=WORKLOAD_CHUNK_SIZE):
+    """
+    Count the workloads of the given users with one query grouped by
+    assignee per chunk of users, which the (assigned_user, status, due_date)
+    index answers.
+    """
+    workloads = dict((pk, empty_workload()) for pk in user_pks)
+    pks = list(workloads)
+    qn = connection.ops.quote_name
+    cursor = connection.cursor()
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start:start + chunk_size]
+        sql = (
+            "SELECT {assigned_user}, COUNT(*), "
+            "SUM(CASE WHEN {due_date} < %s THEN 1 ELSE 0 END), "
+            "SUM(CASE WHEN {status} = %s THEN 1 ELSE 0 END) "
+            "FROM {table} "
+            "WHERE {status} IN ({statuses}) "
+            "AND {assigned_user} IN ({user_pks}) "
+            "GROUP BY {assigned_user}").format(
+                table=qn(Task._meta.db_table),
+                assigned_user=qn('assigned_user_id'),
+                due_date=qn('due_date'),
+                status=qn('status'),
+                statuses=', '.join(['%s'] * len(Task.OPEN_STATUSES)),
+                user_pks=', '.join(['%s'] * len(chunk)))
+        params = ([today, Task.STATUS_CHOICES.ready_for_review] +
+                  list(Task.OPEN_STATUSES) + chunk)
+        cursor.execute(sql, params)
+        for (user_pk, open_count, overdue,
+                ready_for_review) in cursor.fetchall():
+            workloads[user_pk] = {
+                'open': open_count,
+                'overdue': overdue,
+                'ready_for_review': ready_for_review,
+            }
+    return workloads
+
+
+def get_workloads(user_pks, today=None):
+    """
+    Return the workload of every given user by pk, counting only those that
+    are not cached yet.
+    """
+    if today is None:
+        today = local_today()
+    keys = dict((workload_cache_key(pk, today), pk) for pk in user_pks)
+    cached = cache.get_many(list(keys))
+    workloads = dict((keys[key], workload) for key, workload in cached.items())
+    missing = [pk for pk in user_pks if pk not in workloads]
+    if missing:
+        counted = count_workloads(missing, today)
+        cache.set_many(dict((workload_cache_key(pk, today), workload)
+                            for pk, workload in counted.items()),
+                       WORKLOAD_CACHE_TIMEOUT)
+        workloads.update(counted)
+    return workloads
+
+
+def invalidate_workloads(user_pks):
+    today = local_today()
+    cache.delete_many([workload_cache_key(pk, today) for pk in user_pks])